@@ -0,0 +1,279 @@
+import json
+import os
+import re
+
+# 预聚合立方体：发售年份 × 标签 × 现价区间 × 原价区间 × 折扣区间
+# 清洗完成后按 appid 差量更新（减去旧贡献、加上新贡献），仪表盘图表直接读取，不再随数据量变慢。
+# 逐 appid 的贡献另存在 .cube_state.json，仪表盘只读单元格。
+# 标签维度有两类单元格：按逗号拆分后的精确标签，以及 GENRES 中的类型（GENRE_PREFIX + 类型名）。
+# 类型沿用原先按整段标签文本不区分大小写子串匹配的口径（"RPG" 也计入 "Action RPG"、"JRPG"），
+# 图表里的类型统计只读类型单元格，数字与逐行扫描 CSV 时一致
+CUBE_VERSION = 3
+ALL_TAGS = "*"
+GENRE_PREFIX = "*genre:"
+GENRES = ["Action", "RPG", "Strategy", "Shooter", "Adventure", "Simulation", "Indie", "FPS"]
+UNKNOWN_YEAR = 0
+FREE_BUCKET = -1
+PRICE_EDGES = [0, 10, 20, 30, 50, 60, 100]
+DISCOUNT_EDGES = [0, 25, 50, 75]
+MEASURES = ["count", "sum_current_price", "sum_original_price", "sum_discount_rate", "sum_tag_count"]
+
+
+def cube_path_for(csv_file):
+    root, _ = os.path.splitext(str(csv_file))
+    return root + ".cube.json"
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def release_year(released):
+    m = re.search(r"\b(19|20)\d{2}\b", str(released or ""))
+    return int(m.group(0)) if m else UNKNOWN_YEAR
+
+
+def price_bucket(price):
+    if price <= 0:
+        return FREE_BUCKET
+    bucket = 0
+    for i, edge in enumerate(PRICE_EDGES):
+        if price >= edge:
+            bucket = i
+    return bucket
+
+
+def discount_bucket(discount_rate):
+    if discount_rate <= 0:
+        return 0
+    bucket = 0
+    for i, edge in enumerate(DISCOUNT_EDGES, start=1):
+        if discount_rate > edge:
+            bucket = i
+    return bucket
+
+
+def discount_rate(current_price, original_price):
+    if original_price <= 0:
+        return 0.0
+    return (original_price - current_price) / original_price * 100
+
+
+def split_tags(tags):
+    return [t.strip() for t in str(tags or "").split(",") if t.strip()]
+
+
+def match_genres(tags):
+    lowered = str(tags or "").lower()
+    return [g for g in GENRES if g.lower() in lowered]
+
+
+def state_path_for(csv_file):
+    root, _ = os.path.splitext(str(csv_file))
+    return root + ".cube_state.json"
+
+
+def new_cube():
+    # rows 为 appid -> 该游戏计入立方体的内容，只在增量更新时需要，仪表盘读取的文件里不含这部分
+    return {"version": CUBE_VERSION, "cells": {}, "rows": {}}
+
+
+def _contribution(row):
+    """一款游戏对立方体的贡献：[发售年份, 现价, 原价, 标签列表, 匹配的类型列表]"""
+    tags = row.get("tags")
+    return [release_year(row.get("released")), _to_float(row.get("current_price")),
+            _to_float(row.get("original_price")), split_tags(tags), match_genres(tags)]
+
+
+def _cell_tags(tags, genres):
+    return [ALL_TAGS] + tags + [GENRE_PREFIX + g for g in genres]
+
+
+def _apply(cells, contribution, sign=1):
+    year, current, original, tags, genres = contribution
+    rate = discount_rate(current, original)
+    p_bucket = price_bucket(current)
+    o_bucket = price_bucket(original)
+    d_bucket = discount_bucket(rate)
+    values = (sign, sign * current, sign * original, sign * rate, sign * len(tags))
+    for tag in _cell_tags(tags, genres):
+        key = (year, tag, p_bucket, o_bucket, d_bucket)
+        cell = cells.setdefault(key, [0] * len(values))
+        for i, v in enumerate(values):
+            cell[i] += v
+        # 计数归零（或状态与单元格不一致时出现负数）的单元格不保留
+        if cell[0] <= 0:
+            del cells[key]
+
+
+def update_cube(cube, rows, replace=False):
+    """增量更新：新 appid 加入，内容变化的 appid 先减去旧贡献再加上新贡献；
+    replace 为 True 时 rows 是完整数据集，不在其中的 appid 被减去。返回 (新增, 变化, 移除)"""
+    cells, state = cube["cells"], cube["rows"]
+    added = changed = 0
+    present = set()
+    for row in rows:
+        appid = str(row.get("appid", "")).strip()
+        if not appid or appid in present:
+            continue
+        present.add(appid)
+        contribution = _contribution(row)
+        old = state.get(appid)
+        if old == contribution:
+            continue
+        if old is None:
+            added += 1
+        else:
+            _apply(cells, old, -1)
+            changed += 1
+        _apply(cells, contribution)
+        state[appid] = contribution
+    removed = 0
+    if replace:
+        for appid in [a for a in state if a not in present]:
+            _apply(cells, state.pop(appid), -1)
+            removed += 1
+    return added, changed, removed
+
+
+def build_cube(rows):
+    """整体重建：逐行只计算贡献，单元格用 pandas 一次分组求和，结果与逐行 update_cube 相同"""
+    import numpy as np
+    import pandas as pd
+    cube = new_cube()
+    state = cube["rows"]
+    for row in rows:
+        appid = str(row.get("appid", "")).strip()
+        if appid and appid not in state:
+            state[appid] = _contribution(row)
+    if not state:
+        return cube
+    df = pd.DataFrame(list(state.values()), columns=["year", "current", "original", "tags", "genres"])
+    df["rate"] = np.where(df["original"] > 0,
+                          (df["original"] - df["current"]) / df["original"].where(df["original"] > 0) * 100, 0.0)
+    edges = np.array(PRICE_EDGES, dtype=float)
+    for column, bucket in (("current", "p_bucket"), ("original", "o_bucket")):
+        df[bucket] = np.where(df[column] <= 0, FREE_BUCKET,
+                              np.searchsorted(edges, df[column], side="right") - 1)
+    df["d_bucket"] = np.where(df["rate"] <= 0, 0,
+                              np.searchsorted(np.array(DISCOUNT_EDGES, dtype=float), df["rate"], side="left"))
+    df["tag_count"] = df["tags"].map(len)
+    df["tag"] = [_cell_tags(t, g) for t, g in zip(df["tags"], df["genres"])]
+    exploded = df.explode("tag")
+    keys = ["year", "tag", "p_bucket", "o_bucket", "d_bucket"]
+    grouped = exploded.groupby(keys, sort=False).agg(
+        count=("tag", "size"), current=("current", "sum"), original=("original", "sum"),
+        rate=("rate", "sum"), tag_count=("tag_count", "sum"))
+    for key, values in zip(grouped.index, grouped.itertuples(index=False)):
+        year, tag, p_bucket, o_bucket, d_bucket = key
+        cube["cells"][(int(year), tag, int(p_bucket), int(o_bucket), int(d_bucket))] = [
+            int(values.count), float(values.current), float(values.original), float(values.rate),
+            int(values.tag_count)]
+    return cube
+
+
+def _source_signature(source_file):
+    if source_file and os.path.exists(source_file):
+        st = os.stat(source_file)
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    return None
+
+
+def _write_json(path, payload):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def save_cube(cube, cube_file, source_file=None, state_file=None):
+    """立方体写入 cube_file（只有单元格）；给出 state_file 时逐 appid 的贡献写入该文件"""
+    source = _source_signature(source_file)
+    _write_json(cube_file, {
+        "version": cube["version"],
+        "source": source,
+        "price_edges": PRICE_EDGES,
+        "discount_edges": DISCOUNT_EDGES,
+        "measures": MEASURES,
+        "cells": [list(k) + v for k, v in cube["cells"].items()]
+    })
+    if state_file and cube.get("rows") is not None:
+        _write_json(state_file, {"version": cube["version"], "source": source, "rows": cube["rows"]})
+
+
+def load_cube(cube_file, source_file=None):
+    """仪表盘读取：只加载单元格，与数据集大小无关；源文件变化时返回 None"""
+    try:
+        with open(cube_file, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if payload.get("version") != CUBE_VERSION:
+        return None
+    if source_file:
+        source = payload.get("source")
+        try:
+            st = os.stat(source_file)
+        except FileNotFoundError:
+            return None
+        if not source or source.get("size") != st.st_size or source.get("mtime_ns") != st.st_mtime_ns:
+            return None
+    return {
+        "version": payload["version"],
+        "source": payload.get("source"),
+        "cells": {tuple(c[:5]): list(c[5:]) for c in payload.get("cells", [])},
+        "rows": None
+    }
+
+
+def load_cube_for_update(csv_file):
+    """读取立方体及逐 appid 状态；两者不是同一次保存的结果时返回 None"""
+    cube = load_cube(cube_path_for(csv_file))
+    if cube is None:
+        return None
+    try:
+        with open(state_path_for(csv_file), "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if state.get("version") != CUBE_VERSION or state.get("source") != cube["source"]:
+        return None
+    cube["rows"] = state.get("rows", {})
+    return cube
+
+
+def update_cube_file(csv_file, rows):
+    """csv_file 重新写出后调用，rows 为其完整内容：按 appid 差量更新已有立方体，没有可用状态时整体重建"""
+    cube = load_cube_for_update(csv_file)
+    if cube is None:
+        cube = build_cube(rows)
+        counts = (len(cube["rows"]), 0, 0)
+    else:
+        counts = update_cube(cube, rows, replace=True)
+    save_cube(cube, cube_path_for(csv_file), csv_file, state_path_for(csv_file))
+    return counts
+
+
+def load_or_build_cube(csv_file):
+    """读取 CSV 对应的立方体；缺失或过期时重新扫描一次 CSV 生成"""
+    import csv
+    cube_file = cube_path_for(csv_file)
+    cube = load_cube(cube_file, csv_file)
+    if cube is not None:
+        return cube
+    with open(csv_file, "r", encoding="utf-8-sig") as f:
+        cube = build_cube(csv.DictReader(f))
+    save_cube(cube, cube_file, csv_file, state_path_for(csv_file))
+    return cube
+
+
+def cube_records(cube):
+    """按行展开，便于转成 DataFrame 查询"""
+    for (year, tag, p_bucket, o_bucket, d_bucket), values in cube["cells"].items():
+        record = {"release_year": year, "tag": tag, "price_bucket": p_bucket,
+                  "original_bucket": o_bucket, "discount_bucket": d_bucket}
+        record.update(zip(MEASURES, values))
+        yield record
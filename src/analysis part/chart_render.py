@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+import data_analysis as da
+
+# 无界面渲染：每张图单独输出为文件，按 (数据哈希, 图表参数, 图表代码指纹) 缓存
+RENDER_VERSION = 2
+CACHE_INDEX = "render_cache.json"
+DEFAULT_FORMATS = ("png",)
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+_code_fingerprints = {}
+
+
+def code_fingerprint(func):
+    """图表函数所在模块及其依赖的特征表/立方体模块的源码哈希，改动绘图代码后缓存自动失效"""
+    import inspect
+    import aggregate_cube
+    import primary_process
+    module = inspect.getmodule(func)
+    key = module.__name__
+    if key not in _code_fingerprints:
+        h = hashlib.sha256()
+        for m in (module, aggregate_cube, primary_process):
+            h.update(file_hash(inspect.getsourcefile(m)).encode("ascii"))
+        _code_fingerprints[key] = h.hexdigest()
+    return _code_fingerprints[key]
+
+
+def chart_cache_key(data_hash, name, args, fmt, dpi, code=""):
+    payload = json.dumps([RENDER_VERSION, data_hash, name, args, fmt, dpi, code], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _load_index(render_dir):
+    try:
+        with open(os.path.join(render_dir, CACHE_INDEX), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_index(render_dir, index):
+    tmp = os.path.join(render_dir, CACHE_INDEX + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(render_dir, CACHE_INDEX))
+
+
+def render_chart(input_file, name, out_file, dpi=120):
+    """在当前进程中渲染单张图表到文件（工作进程入口）"""
+    plt.switch_backend("Agg")
+    da.setup_fonts()
+    chart = {c[0]: c for c in da.CHARTS}[name]
+    _, func, args, _ = chart
+    fig, ax = plt.subplots(figsize=(8, 6))
+    try:
+        func(da.get_analysis_context(input_file), *args, ax)
+        fig.tight_layout()
+        fig.savefig(out_file, dpi=dpi)
+    finally:
+        plt.close(fig)
+    return out_file
+
+
+def render_charts(input_file, render_dir, formats=DEFAULT_FORMATS, workers=None, dpi=120):
+    """把 data_analysis 中的全部图表渲染到 render_dir，返回 (已渲染, 命中缓存) 文件列表"""
+    os.makedirs(render_dir, exist_ok=True)
+    data_hash = file_hash(input_file)
+    index = _load_index(render_dir)
+
+    jobs = []
+    cached = []
+    for name, func, args, _ in da.CHARTS:
+        code = code_fingerprint(func)
+        for fmt in formats:
+            out_file = os.path.join(render_dir, f"{name}.{fmt}")
+            key = chart_cache_key(data_hash, name, args, fmt, dpi, code)
+            if index.get(os.path.basename(out_file)) == key and os.path.exists(out_file):
+                cached.append(out_file)
+            else:
+                jobs.append((name, out_file, key))
+
+    rendered = []
+    if jobs:
+        # 先在主进程生成特征表和聚合立方体，避免多个工作进程同时写入
+        da.get_analysis_context(input_file).cube
+        workers = workers or min(len(jobs), os.cpu_count() or 1)
+        if workers <= 1:
+            for name, out_file, _ in jobs:
+                rendered.append(render_chart(input_file, name, out_file, dpi))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(render_chart, input_file, name, out_file, dpi)
+                           for name, out_file, _ in jobs]
+                rendered = [f.result() for f in futures]
+        for _, out_file, key in jobs:
+            index[os.path.basename(out_file)] = key
+        _save_index(render_dir, index)
+    return rendered, cached
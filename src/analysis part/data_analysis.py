@@ -2,36 +2,86 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
-from datetime import datetime
 import warnings
 import sys
 import io
+import os
 warnings.filterwarnings('ignore')
 
-if sys.stdout.encoding != 'utf-8':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-if sys.stderr.encoding != 'utf-8':
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from aggregate_cube import (load_or_build_cube, cube_records, ALL_TAGS, GENRE_PREFIX, UNKNOWN_YEAR,
+                            FREE_BUCKET, PRICE_EDGES, MEASURES)
+from primary_process import load_features
+
 sns.set_style("whitegrid")
 
+def ensure_utf8_output():
+    # 只在真正输出分析结果时切换编码，避免导入模块就替换 sys.stdout
+    if sys.stdout.encoding != 'utf-8':
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    if sys.stderr.encoding != 'utf-8':
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
 def load_and_preprocess_data(input_file):
-    for encoding in ['utf-8-sig', 'utf-8', 'gbk', 'gb18030']:
-        try:
-            df = pd.read_csv(input_file, encoding=encoding)
-            break
-        except UnicodeDecodeError:
-            continue
-    else:
-        df = pd.read_csv(input_file, encoding='utf-8', errors='ignore')
-    df['discount_rate'] = ((df['original_price'] - df['current_price']) / df['original_price'] * 100).fillna(0)
-    df['released'] = pd.to_datetime(df['released'], errors='coerce')
-    df['days_since_release'] = (datetime.now() - df['released']).dt.days
-    df['tag_count'] = df['tags'].str.count(',') + 1
-    df['tag_count'] = df['tag_count'].fillna(0)
-    return df
-
-def show_free_rank(input_file, ax):
-    df = load_and_preprocess_data(input_file)
+    # 派生特征由 primary_process 按清洗文件生成一次并持久化
+    return load_features(input_file)
+
+# 同一份 CSV 只读取、预处理一次，按 (路径, mtime, 大小) 缓存
+_CONTEXT_CACHE = {}
+
+class AnalysisContext:
+    """一次加载、多图共享的分析上下文"""
+
+    def __init__(self, input_file, df):
+        self.input_file = input_file
+        self.df = df
+        self._cube = None
+
+    @property
+    def cube(self):
+        """预聚合立方体（DataFrame），首次访问时读取"""
+        if self._cube is None:
+            cube = load_or_build_cube(self.input_file)
+            self._cube = pd.DataFrame(list(cube_records(cube)),
+                                      columns=['release_year', 'tag', 'price_bucket',
+                                               'original_bucket', 'discount_bucket'] + MEASURES)
+        return self._cube
+
+def _file_signature(input_file):
+    st = os.stat(input_file)
+    return (os.path.abspath(input_file), st.st_mtime_ns, st.st_size)
+
+def get_analysis_context(input_file):
+    key = _file_signature(input_file)
+    ctx = _CONTEXT_CACHE.get(key)
+    if ctx is None:
+        for old_key in [k for k in _CONTEXT_CACHE if k[0] == key[0]]:
+            del _CONTEXT_CACHE[old_key]
+        ctx = AnalysisContext(input_file, load_and_preprocess_data(input_file))
+        _CONTEXT_CACHE[key] = ctx
+    return ctx
+
+def _as_context(source):
+    if isinstance(source, AnalysisContext):
+        return source
+    return get_analysis_context(source)
+
+def _bucket_floor(bucket):
+    return 0 if bucket == FREE_BUCKET else PRICE_EDGES[bucket]
+
+def _game_cells(cube):
+    return cube[cube['tag'] == ALL_TAGS]
+
+def _genre_cells(cube):
+    # 类型按标签文本子串匹配（与原先 str.contains 口径一致），见 aggregate_cube.GENRES
+    genres = cube[cube['tag'].str.startswith(GENRE_PREFIX)]
+    return genres.assign(genre=genres['tag'].str[len(GENRE_PREFIX):])
+
+def show_free_rank(source, ax):
+    df = _as_context(source).df
     free_games = df[df["current_price"] == 0.0].head(10)
     if len(free_games) == 0:
         ax.text(0.5, 0.5, '没有免费游戏数据', ha='center', va='center', transform=ax.transAxes)
@@ -49,8 +99,8 @@ def show_free_rank(input_file, ax):
         ax.text(bar.get_x() + bar.get_width()/2, bar.get_height()/2, 
                 f'{ranks[i]}', ha='center', va='center')
 
-def show_tag_rank(input_file, tag, ax):
-    df = load_and_preprocess_data(input_file)
+def show_tag_rank(source, tag, ax):
+    df = _as_context(source).df
     pattern = '|'.join(tag)
     tag_games = df[df['tags'].str.contains(pattern, regex=True, na=False)].head(10)
     
@@ -68,8 +118,8 @@ def show_tag_rank(input_file, tag, ax):
     ax.set_ylabel("排名")
     ax.invert_yaxis()
 
-def show_discount_rank(input_file, ax):
-    df = load_and_preprocess_data(input_file)
+def show_discount_rank(source, ax):
+    df = _as_context(source).df
     discounted = df[df['discount_rate'] > 0].nlargest(10, 'discount_rate')
     
     if len(discounted) == 0:
@@ -89,49 +139,78 @@ def show_discount_rank(input_file, ax):
                 ha='left', va='center')
 
 
-def analyze_discount_vs_release_time(input_file, ax):
-    df = load_and_preprocess_data(input_file)
-    valid_data = df[(df['discount_rate'] > 0) & (df['days_since_release'] > 0)].copy()
+# 超过该行数时改用二维分箱密度图，绘图开销只与分箱数有关
+DENSITY_THRESHOLD = 5000
+DENSITY_BINS = (60, 40)
+
+def _plot_discount_density(valid_data, ax, bins):
+    x = valid_data['days_since_release'].to_numpy(dtype=float)
+    y = valid_data['discount_rate'].to_numpy(dtype=float)
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins)
+    price_sums, _, _ = np.histogram2d(x, y, bins=[x_edges, y_edges],
+                                      weights=valid_data['current_price'].to_numpy(dtype=float))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_price = np.ma.masked_where(counts == 0, price_sums / counts)
+    mesh = ax.pcolormesh(x_edges, y_edges, mean_price.T, cmap='viridis', alpha=0.85)
+
+    occupied = counts > 0
+    if occupied.sum() >= 2:
+        x_centers = (x_edges[:-1] + x_edges[1:]) / 2
+        y_centers = (y_edges[:-1] + y_edges[1:]) / 2
+        xx, yy = np.meshgrid(x_centers, y_centers, indexing='ij')
+        z = np.polyfit(xx[occupied], yy[occupied], 1, w=np.sqrt(counts[occupied]))
+        p = np.poly1d(z)
+        ax.plot(x_edges[[0, -1]], p(x_edges[[0, -1]]), "r--", alpha=0.8, linewidth=2)
+    return mesh
+
+def analyze_discount_vs_release_time(source, ax, density=None, bins=DENSITY_BINS):
+    df = _as_context(source).df
+    valid_data = df[(df['discount_rate'] > 0) & (df['days_since_release'] > 0)]
     
     if len(valid_data) == 0:
         ax.text(0.5, 0.5, '没有足够的折扣数据', ha='center', va='center', transform=ax.transAxes)
         return
     
-    scatter = ax.scatter(valid_data['days_since_release'], valid_data['discount_rate'], 
-                        c=valid_data['current_price'], cmap='viridis', alpha=0.7, s=60)
+    if density is None:
+        density = len(valid_data) > DENSITY_THRESHOLD
     
-    if len(valid_data) >= 2:
-        z = np.polyfit(valid_data['days_since_release'], valid_data['discount_rate'], 1)
-        p = np.poly1d(z)
-        ax.plot(valid_data['days_since_release'], p(valid_data['days_since_release']), 
-                "r--", alpha=0.8, linewidth=2)
+    if density:
+        scatter = _plot_discount_density(valid_data, ax, bins)
+    else:
+        scatter = ax.scatter(valid_data['days_since_release'], valid_data['discount_rate'], 
+                            c=valid_data['current_price'], cmap='viridis', alpha=0.7, s=60)
+        
+        if len(valid_data) >= 2:
+            z = np.polyfit(valid_data['days_since_release'], valid_data['discount_rate'], 1)
+            p = np.poly1d(z)
+            ax.plot(valid_data['days_since_release'], p(valid_data['days_since_release']), 
+                    "r--", alpha=0.8, linewidth=2)
     
     ax.set_title("折扣深度 vs 发售时长分析")
     ax.set_xlabel("发售天数")
     ax.set_ylabel("折扣率 (%)")
     
     cbar = plt.colorbar(scatter, ax=ax)
-    cbar.set_label('当前价格 (¥)')
+    cbar.set_label('平均当前价格 (¥)' if density else '当前价格 (¥)')
 
-def analyze_free_vs_paid_characteristics(input_file, ax):
-    df = load_and_preprocess_data(input_file)
+def analyze_free_vs_paid_characteristics(source, ax):
+    games = _game_cells(_as_context(source).cube)
     
-    free_games = df[df['current_price'] == 0]
-    paid_games = df[df['current_price'] > 0]
+    free_games = games[games['price_bucket'] == FREE_BUCKET]
+    paid_games = games[games['price_bucket'] != FREE_BUCKET]
+    free_count = free_games['count'].sum()
+    paid_count = paid_games['count'].sum()
     
-    if len(free_games) == 0 or len(paid_games) == 0:
+    if free_count == 0 or paid_count == 0:
         ax.text(0.5, 0.5, '数据不足，无法比较', ha='center', va='center', transform=ax.transAxes)
         return
     
-    free_avg_tags = free_games['tag_count'].mean()
-    paid_avg_tags = paid_games['tag_count'].mean()
-    
-    free_top_tags = free_games['tags'].str.split(', ').explode().value_counts().head(3)
-    paid_top_tags = paid_games['tags'].str.split(', ').explode().value_counts().head(3)
+    free_avg_tags = free_games['sum_tag_count'].sum() / free_count
+    paid_avg_tags = paid_games['sum_tag_count'].sum() / paid_count
     
     categories = ['平均标签数', '游戏数量']
-    free_values = [free_avg_tags, len(free_games)]
-    paid_values = [paid_avg_tags, len(paid_games)]
+    free_values = [free_avg_tags, free_count]
+    paid_values = [paid_avg_tags, paid_count]
     
     x = np.arange(len(categories))
     width = 0.35
@@ -150,11 +229,11 @@ def analyze_free_vs_paid_characteristics(input_file, ax):
             ax.text(bar.get_x() + bar.get_width()/2., height,
                    f'{height:.1f}', ha='center', va='bottom')
 
-def analyze_discount_effectiveness(input_file, ax):
-    df = load_and_preprocess_data(input_file)
-    paid_games = df[df['current_price'] > 0].copy()
+def analyze_discount_effectiveness(source, ax):
+    games = _game_cells(_as_context(source).cube)
+    paid_games = games[games['price_bucket'] != FREE_BUCKET]
     
-    if len(paid_games) == 0:
+    if paid_games['count'].sum() == 0:
         ax.text(0.5, 0.5, '没有付费游戏数据', ha='center', va='center', transform=ax.transAxes)
         return
     
@@ -165,15 +244,13 @@ def analyze_discount_effectiveness(input_file, ax):
     discount_data = []
     range_labels = []
     
+    floors = paid_games['original_bucket'].map(_bucket_floor)
     for min_price, max_price, label in price_ranges:
-        if max_price == float('inf'):
-            range_games = paid_games[paid_games['original_price'] >= min_price]
-        else:
-            range_games = paid_games[(paid_games['original_price'] >= min_price) & 
-                                   (paid_games['original_price'] < max_price)]
+        range_games = paid_games[(floors >= min_price) & (floors < max_price)]
+        range_count = range_games['count'].sum()
         
-        if len(range_games) > 0:
-            discounted_ratio = len(range_games[range_games['discount_rate'] > 0]) / len(range_games) * 100
+        if range_count > 0:
+            discounted_ratio = range_games[range_games['discount_bucket'] > 0]['count'].sum() / range_count * 100
             discount_data.append(discounted_ratio)
             range_labels.append(label)
     
@@ -191,11 +268,10 @@ def analyze_discount_effectiveness(input_file, ax):
         ax.text(bar.get_x() + bar.get_width()/2., height + 2,
                f'{height:.1f}%', ha='center', va='bottom')
 
-def analyze_genre_popularity_trend(input_file, ax):
-    df = load_and_preprocess_data(input_file)
+def analyze_genre_popularity_trend(source, ax):
+    cube = _as_context(source).cube
     
-    df['release_year'] = df['released'].dt.year
-    valid_data = df.dropna(subset=['release_year', 'tags'])
+    valid_data = _genre_cells(cube[cube['release_year'] != UNKNOWN_YEAR])
     
     if len(valid_data) == 0:
         ax.text(0.5, 0.5, '没有足够的时间数据', ha='center', va='center', transform=ax.transAxes)
@@ -203,16 +279,12 @@ def analyze_genre_popularity_trend(input_file, ax):
     
     main_genres = ['Action', 'RPG', 'Strategy', 'Shooter', 'Adventure']
     
-    year_genre_data = {}
     years = sorted(valid_data['release_year'].unique())
+    year_genre = valid_data.groupby(['genre', 'release_year'])['count'].sum()
+    year_genre_data = {}
     
     for genre in main_genres:
-        genre_counts = []
-        for year in years:
-            year_games = valid_data[valid_data['release_year'] == year]
-            genre_count = len(year_games[year_games['tags'].str.contains(genre, na=False, case=False)])
-            genre_counts.append(genre_count)
-        year_genre_data[genre] = genre_counts
+        year_genre_data[genre] = [int(year_genre.get((genre, year), 0)) for year in years]
     
     colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7']
     for i, (genre, counts) in enumerate(year_genre_data.items()):
@@ -226,17 +298,15 @@ def analyze_genre_popularity_trend(input_file, ax):
     ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
     ax.grid(True, alpha=0.3)
 
-def analyze_tag_discount_pattern(input_file, ax):
-    df = load_and_preprocess_data(input_file)
+def analyze_tag_discount_pattern(source, ax):
+    tag_totals = _genre_cells(_as_context(source).cube).groupby('genre')[['count', 'sum_discount_rate']].sum()
     
     main_tags = ['Action', 'RPG', 'Strategy', 'Simulation', 'Adventure', 'Indie', 'FPS']
     tag_discounts = {}
     
     for tag in main_tags:
-        tag_games = df[df['tags'].str.contains(tag, na=False, case=False)]
-        if len(tag_games) > 0:
-            avg_discount = tag_games['discount_rate'].mean()
-            tag_discounts[tag] = avg_discount
+        if tag in tag_totals.index and tag_totals.at[tag, 'count'] > 0:
+            tag_discounts[tag] = tag_totals.at[tag, 'sum_discount_rate'] / tag_totals.at[tag, 'count']
     
     if not tag_discounts:
         ax.text(0.5, 0.5, '没有足够的标签数据', ha='center', va='center', transform=ax.transAxes)
@@ -256,20 +326,21 @@ def analyze_tag_discount_pattern(input_file, ax):
         ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.5, 
                 f'{discounts[i]:.1f}%', ha='center', va='bottom')
 
-def analyze_price_distribution_by_category(input_file, ax):
-    df = load_and_preprocess_data(input_file)
-    paid_games = df[df['current_price'] > 0].copy()
+def analyze_price_distribution_by_category(source, ax):
+    games = _game_cells(_as_context(source).cube)
+    paid_games = games[games['price_bucket'] != FREE_BUCKET]
     
-    if len(paid_games) == 0:
+    if paid_games['count'].sum() == 0:
         ax.text(0.5, 0.5, '没有付费游戏数据', ha='center', va='center', transform=ax.transAxes)
         return
     
     price_bins = [0, 10, 30, 60, 100, float('inf')]
     price_labels = ['低价\n(≤¥10)', '中低价\n(¥10-30)', '中价\n(¥30-60)', '高价\n(¥60-100)', '超高价\n(>¥100)']
     
-    paid_games['price_category'] = pd.cut(paid_games['current_price'], 
-                                         bins=price_bins, labels=price_labels, right=False)
-    price_counts = paid_games['price_category'].value_counts()
+    price_category = pd.cut(paid_games['price_bucket'].map(_bucket_floor),
+                            bins=price_bins, labels=price_labels, right=False)
+    price_counts = paid_games.groupby(price_category, observed=True)['count'].sum()
+    price_counts = price_counts[price_counts > 0].sort_values(ascending=False)
     
     colors = ['#FF9999', '#66B2FF', '#99FF99', '#FFCC99', '#FF99CC']
     wedges, texts, autotexts = ax.pie(price_counts.values, labels=price_counts.index, 
@@ -281,33 +352,34 @@ def analyze_price_distribution_by_category(input_file, ax):
         autotext.set_color('white')
         autotext.set_fontweight('bold')
 
-def show_comprehensive_analysis(input_file):
+# 图表注册表：(名称, 绘图函数, 额外参数, 仪表盘网格位置)
+CHARTS = [
+    ("free_rank", show_free_rank, (), (2, 0)),
+    ("tag_rank_action", show_tag_rank, (["Action"],), (2, 1)),
+    ("discount_rank", show_discount_rank, (), (1, 2)),
+    ("discount_vs_release_time", analyze_discount_vs_release_time, (), (1, 0)),
+    ("price_distribution", analyze_price_distribution_by_category, (), (1, 1)),
+    ("free_vs_paid", analyze_free_vs_paid_characteristics, (), (0, 0)),
+    ("discount_effectiveness", analyze_discount_effectiveness, (), (0, 1)),
+    ("genre_popularity_trend", analyze_genre_popularity_trend, (), (0, 2)),
+    ("tag_discount_pattern", analyze_tag_discount_pattern, (), (2, 2)),
+]
+
+def setup_fonts():
     plt.rcParams['font.family'] = ["SimHei","DejaVu Sans", "STIXGeneral"]
     plt.rcParams['axes.unicode_minus'] = False
+
+def show_comprehensive_analysis(input_file):
+    ctx = get_analysis_context(input_file)
+    setup_fonts()
     fig = plt.figure(figsize=(16, 12))
     gs = fig.add_gridspec(3, 3, hspace=0.3, wspace=0.3)
-    ax1 = fig.add_subplot(gs[2, 0])
-    show_free_rank(input_file, ax1)
-    ax2 = fig.add_subplot(gs[2, 1])
-    show_tag_rank(input_file, ["Action"], ax2)
-    ax3 = fig.add_subplot(gs[1, 2])
-    show_discount_rank(input_file, ax3)
-    ax4 = fig.add_subplot(gs[1, 0])
-    analyze_discount_vs_release_time(input_file, ax4)
-    ax5 = fig.add_subplot(gs[1, 1])
-    analyze_price_distribution_by_category(input_file, ax5)
-    ax6 = fig.add_subplot(gs[0, 0])
-    analyze_free_vs_paid_characteristics(input_file, ax6)
-    ax7 = fig.add_subplot(gs[0, 1])
-    analyze_discount_effectiveness(input_file, ax7)
-    ax8 = fig.add_subplot(gs[0, 2])
-    analyze_genre_popularity_trend(input_file, ax8)
-    ax9 = fig.add_subplot(gs[2, 2])
-    analyze_tag_discount_pattern(input_file, ax9)
+    for name, func, args, (row, col) in CHARTS:
+        ax = fig.add_subplot(gs[row, col])
+        func(ctx, *args, ax)
     plt.tight_layout()
     plt.show()
 
 def run_analysis(input_file):
+    ensure_utf8_output()
     show_comprehensive_analysis(input_file)
-
-    
\ No newline at end of file
@@ -1,24 +1,95 @@
-import csv
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from aggregate_cube import PRICE_EDGES, FREE_BUCKET
+
 #简单处理
-#给清理后的数据挨个加上排名以及折扣率
-def primary_process(input_file):
-    output_file = "../../data/analysis_use.csv"
-    with open(input_file, 'r',encoding="utf-8") as uncleaned, \
-            open(output_file, 'w',encoding="utf-8") as cleaned:
-        reader = csv.reader(uncleaned)
-        writer = csv.writer(cleaned)
-        newtitle = [h for h in next(reader)]+['rank','discounts']
-        writer.writerow(newtitle)
-        for i,row in enumerate(reader,start=1):
-            rank = str(i)
-            #是否是免费游戏，不然除数不能为0
-            if row[4] == str(0.0):
-                discount = '100'
-            else:
-                discount = str(round((float(row[3])/float(row[4])),3)*100)
-            newrow = row + [rank,discount]
-            writer.writerow(newrow)
+#给清理后的数据一次性算好排名、折扣率、发售天数、标签数和价格区间，
+#持久化到清洗文件旁边，分析时直接读取，不再每次加载都重新计算
+SCHEMA_VERSION = 1
+FEATURE_COLUMNS = ['rank', 'discount_rate', 'released', 'release_year',
+                   'days_since_release', 'tag_count', 'price_bucket']
+
+
+def features_path_for(input_file):
+    root, _ = os.path.splitext(str(input_file))
+    return root + ".features.pkl"
+
+
+def read_cleaned_csv(input_file):
+    for encoding in ['utf-8-sig', 'utf-8', 'gbk', 'gb18030']:
+        try:
+            return pd.read_csv(input_file, encoding=encoding)
+        except UnicodeDecodeError:
+            continue
+    return pd.read_csv(input_file, encoding='utf-8', encoding_errors='ignore')
+
+
+def build_features(df, now=None):
+    now = now or datetime.now()
+    df = df.copy()
+    df['rank'] = np.arange(1, len(df) + 1)
+    original = df['original_price']
+    #免费游戏原价为0，不能直接做除数
+    df['discount_rate'] = ((original - df['current_price']) / original.where(original > 0) * 100).fillna(0)
+    df['released'] = pd.to_datetime(df['released'], errors='coerce')
+    df['release_year'] = df['released'].dt.year
+    df['days_since_release'] = (now - df['released']).dt.days
+    df['tag_count'] = (df['tags'].str.count(',') + 1).fillna(0)
+    bucket = np.searchsorted(PRICE_EDGES, df['current_price'].fillna(0).to_numpy(), side='right') - 1
+    df['price_bucket'] = np.where(df['current_price'].fillna(0) > 0, bucket, FREE_BUCKET)
+    return df
+
+
+def _source_signature(input_file):
+    st = os.stat(input_file)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def primary_process(input_file, output_file=None):
+    """为清洗后的数据生成特征表并保存，返回 DataFrame"""
+    output_file = output_file or features_path_for(input_file)
+    built_at = datetime.now()
+    df = build_features(read_cleaned_csv(input_file), now=built_at)
+    tmp = f"{output_file}.{os.getpid()}.tmp"
+    pd.to_pickle({
+        "schema_version": SCHEMA_VERSION,
+        "source": _source_signature(input_file),
+        "built_at": built_at,
+        "features": df
+    }, tmp, compression=None)
+    os.replace(tmp, output_file)
+    return df
+
+
+def load_features(input_file):
+    """读取特征表；不存在、结构版本或源文件变化时重新生成"""
+    feature_file = features_path_for(input_file)
+    try:
+        payload = pd.read_pickle(feature_file, compression=None)
+    except Exception:
+        # 缓存损坏或由不兼容的 pandas/numpy 版本写出（AttributeError、ModuleNotFoundError、
+        # UnpicklingError 等）时一律重建，特征表只是派生数据
+        payload = None
+    if (not isinstance(payload, dict) or payload.get("schema_version") != SCHEMA_VERSION
+            or payload.get("source") != _source_signature(input_file)):
+        return primary_process(input_file, feature_file)
+    df = payload["features"]
+    #发售天数按当天重新对齐，无需重算整张表
+    elapsed_days = (datetime.now().date() - payload["built_at"].date()).days
+    if elapsed_days:
+        df['days_since_release'] = df['days_since_release'] + elapsed_days
+    return df
+
 
 # 测试用
 if __name__ == '__main__':
-    primary_process('../../data/steam_topsellers_simple_cleaned.csv')
\ No newline at end of file
+    primary_process(os.path.join(os.path.dirname(SRC_DIR), 'data', 'steam_topsellers_simple_cleaned.csv'))
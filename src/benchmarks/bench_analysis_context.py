@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析上下文基准：对比每张图各自加载 CSV 与共享 AnalysisContext 的耗时
+用法: python bench_analysis_context.py [--rows 500000]
+"""
+
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+BENCH_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCH_DIR.parent / "analysis part"))
+
+import data_analysis as da
+import primary_process as pp
+from synthetic import write_synthetic_games_csv
+
+CHARTS_PER_DASHBOARD = 9
+
+
+def bench_reload_per_chart(input_file):
+    # 旧做法：每张图都重新读取 CSV 并计算派生特征
+    start = time.perf_counter()
+    for _ in range(CHARTS_PER_DASHBOARD):
+        pp.build_features(pp.read_cleaned_csv(input_file))
+    return time.perf_counter() - start
+
+
+def bench_shared_context(input_file):
+    da._CONTEXT_CACHE.clear()
+    start = time.perf_counter()
+    for _ in range(CHARTS_PER_DASHBOARD):
+        da.get_analysis_context(input_file)
+    return time.perf_counter() - start
+
+
+def bench_feature_table(input_file):
+    # 特征表已持久化后的再次加载
+    da._CONTEXT_CACHE.clear()
+    start = time.perf_counter()
+    da.get_analysis_context(input_file)
+    return time.perf_counter() - start
+
+
+def bench_dashboard(input_file):
+    da._CONTEXT_CACHE.clear()
+    start = time.perf_counter()
+    da.show_comprehensive_analysis(input_file)
+    elapsed = time.perf_counter() - start
+    plt.close("all")
+    return elapsed
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='分析上下文基准')
+    parser.add_argument('--rows', type=int, default=500000, help='合成数据行数 (默认500000)')
+    parser.add_argument('--no-render', action='store_true', help='只测加载，不渲染仪表盘')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, "synthetic_games.csv")
+        print(f"生成 {args.rows} 行合成数据 ...")
+        write_synthetic_games_csv(input_file, args.rows)
+
+        reload_time = bench_reload_per_chart(input_file)
+        shared_time = bench_shared_context(input_file)
+        print(f"每图重复加载 x{CHARTS_PER_DASHBOARD}: {reload_time:.2f} 秒")
+        print(f"共享上下文:        {shared_time:.2f} 秒")
+        print(f"加速比: {reload_time / max(shared_time, 1e-9):.1f}x")
+        print(f"读取已持久化的特征表: {bench_feature_table(input_file):.2f} 秒")
+
+        if not args.no_render:
+            print(f"完整仪表盘渲染 (Agg): {bench_dashboard(input_file):.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
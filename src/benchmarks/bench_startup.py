@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+冷启动基准：测量 main_pipeline 每个 --step 以及 show_stats 的导入耗时
+每次在全新的子进程里计时，不发起任何网络请求、不执行步骤本身
+用法: python bench_startup.py [--repeat 5]
+"""
+
+import os
+import subprocess
+import sys
+import statistics
+from pathlib import Path
+
+SRC_DIR = Path(__file__).parent.parent
+
+# 每个步骤在执行时按需导入的模块
+STEP_IMPORTS = {
+    "1": ["main_pipeline", "steam_data_extractor"],
+    "2": ["main_pipeline", "clean.data_cleaner"],
+    "3": ["main_pipeline", "comments.simple_steam_crawler_easy"],
+    "4": ["main_pipeline", "data_analysis"],
+    "stats": ["show_stats"],
+    "eager": ["main_pipeline", "steam_data_extractor", "clean.data_cleaner",
+              "comments.simple_steam_crawler_easy", "data_analysis"],
+}
+
+TIMER = """
+import sys, time
+sys.path[:0] = {paths!r}
+t = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+print(time.perf_counter() - t, len(sys.modules))
+"""
+
+
+def measure(modules, repeat):
+    paths = [str(SRC_DIR), str(SRC_DIR / "analysis part")]
+    code = TIMER.format(paths=paths, modules=modules)
+    times = []
+    n_modules = 0
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                             check=True, env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"))
+        elapsed, n_modules = out.stdout.split()
+        times.append(float(elapsed))
+    return statistics.median(times), int(n_modules)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='冷启动基准')
+    parser.add_argument('--repeat', type=int, default=5, help='每个步骤重复次数 (默认5)')
+    args = parser.parse_args()
+
+    print(f"{'步骤':<8}{'导入耗时(ms)':>14}{'已加载模块':>12}")
+    for step, modules in STEP_IMPORTS.items():
+        elapsed, n_modules = measure(modules, args.repeat)
+        print(f"{step:<8}{elapsed * 1000:>14.1f}{n_modules:>12}")
+
+
+if __name__ == "__main__":
+    main()
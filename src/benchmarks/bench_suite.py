@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线基准套件：对本地 Steam 桩服务器运行抓取/评论步骤，对合成数据运行清洗、
+威胁检测和分析加载，记录吞吐量、延迟分位数和峰值内存，结果写入 JSON 便于回归对比
+用法: python bench_suite.py [--sizes 100,10000,100000] [--network-sizes 100,1000]
+                            [--latency 0.005] [--error-rate 0.02] [--output results.json]
+                            [--tail-rate 0.02 --tail-latency 0.5] [--hedge 0.05]
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+SRC_DIR = BENCH_DIR.parent
+sys.path[:0] = [str(SRC_DIR), str(SRC_DIR / "analysis part"), str(BENCH_DIR)]
+
+OFFLINE_BENCHES = ["clean_data", "detect_threats", "analysis_load"]
+NETWORK_BENCHES = ["step1_extract_games", "step3_analyze_comments"]
+ARGS = None
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"p50_ms": pick(0.50) * 1000, "p95_ms": pick(0.95) * 1000,
+            "p99_ms": pick(0.99) * 1000, "max_ms": ordered[-1] * 1000}
+
+
+def timed_calls(func):
+    samples = []
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - start)
+    return wrapper, samples
+
+
+def make_pipeline(tmp):
+    import main_pipeline
+    pipeline = main_pipeline.SteamAnalysisPipeline()
+    pipeline.fetch_workers = ARGS.fetch_workers
+    for attr in ("raw_csv", "cleaned_csv", "comment_analysis_csv", "suspicious_reviews_csv",
+                 "list_ranks_csv", "db_file", "price_history_dir", "threat_trends_file"):
+        setattr(pipeline, attr, Path(tmp) / getattr(pipeline, attr).name)
+    return pipeline
+
+
+def stub_server(size, args):
+    from stub_steam_server import StubSteamServer
+    return StubSteamServer(size, args.latency, args.error_rate,
+                           tail_rate=args.tail_rate, tail_latency=args.tail_latency)
+
+
+def bench_step1_extract_games(size, tmp, args):
+    from stub_steam_server import SEARCH_PAGE_SIZE
+    with stub_server(size, args) as server:
+        server.point_modules_here()
+        pipeline = make_pipeline(tmp)
+        pipeline.enrich_item, samples = timed_calls(pipeline.enrich_item)
+        pages = -(-size // SEARCH_PAGE_SIZE)
+        start = time.perf_counter()
+        games = pipeline.step1_extract_games(pages=pages)
+        elapsed = time.perf_counter() - start
+        return {"items": len(games), "seconds": elapsed, "latency": percentiles(samples),
+                "injected_429": server.state.injected_429, "requests": server.state.requests}
+
+
+def bench_step3_analyze_comments(size, tmp, args):
+    import comments.simple_steam_crawler_easy as crawler
+    from synthetic import write_synthetic_games_csv
+    with stub_server(size, args) as server:
+        server.point_modules_here()
+        pipeline = make_pipeline(tmp)
+        write_synthetic_games_csv(str(pipeline.cleaned_csv), size, seed=7)
+        crawler.analyze_game_threats, samples = timed_calls(crawler.analyze_game_threats)
+        start = time.perf_counter()
+        results = pipeline.step3_analyze_comments(max_games=size, max_reviews_per_game=args.reviews)
+        elapsed = time.perf_counter() - start
+        return {"items": len(results), "seconds": elapsed, "latency": percentiles(samples),
+                "injected_429": server.state.injected_429, "requests": server.state.requests}
+
+
+def bench_clean_data(size, tmp, args):
+    import clean.data_cleaner as cleaner
+    from synthetic import write_synthetic_games_csv
+    cleaner.INPUT_FILE = write_synthetic_games_csv(os.path.join(tmp, "raw.csv"), size)
+    cleaner.OUTPUT_FILE = os.path.join(tmp, "cleaned.csv")
+    start = time.perf_counter()
+    cleaner.clean_data()
+    return {"items": size, "seconds": time.perf_counter() - start}
+
+
+def bench_detect_threats(size, tmp, args):
+    from comments.simple_steam_crawler_easy import detect_threats
+    from stub_steam_server import REVIEW_TEXTS
+    texts = [REVIEW_TEXTS[i % len(REVIEW_TEXTS)] + f" #{i}" for i in range(size)]
+    samples = []
+    start = time.perf_counter()
+    for text in texts:
+        t = time.perf_counter()
+        detect_threats(text)
+        samples.append(time.perf_counter() - t)
+    return {"items": size, "seconds": time.perf_counter() - start, "latency": percentiles(samples)}
+
+
+def bench_analysis_load(size, tmp, args):
+    import data_analysis as da
+    from synthetic import write_synthetic_games_csv
+    input_file = write_synthetic_games_csv(os.path.join(tmp, "cleaned.csv"), size)
+    start = time.perf_counter()
+    ctx = da.get_analysis_context(input_file)
+    ctx.cube
+    cold = time.perf_counter() - start
+    da._CONTEXT_CACHE.clear()
+    start = time.perf_counter()
+    da.get_analysis_context(input_file).cube
+    warm = time.perf_counter() - start
+    return {"items": size, "seconds": cold, "warm_seconds": warm}
+
+
+def run_single(name, size, args):
+    global ARGS
+    import parse_pool
+    import perf_metrics
+    ARGS = args
+    perf_metrics.SLEEP_SCALE = 0.0
+    parse_pool.configure(args.parse_workers)
+    perf_metrics.configure_hedging(args.hedge, concurrency=args.fetch_workers)
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            result = globals()[f"bench_{name}"](size, tmp, args)
+        finally:
+            parse_pool.shutdown()
+    result.update({"bench": name, "size": size, "peak_rss_mb": peak_rss_mb(),
+                   "throughput_per_s": result["items"] / result["seconds"] if result["seconds"] else None})
+    return result
+
+
+def run_in_subprocess(name, size, args):
+    cmd = [sys.executable, __file__, "--single", name, str(size),
+           "--latency", str(args.latency), "--error-rate", str(args.error_rate),
+           "--reviews", str(args.reviews), "--fetch-workers", str(args.fetch_workers),
+           "--parse-workers", str(args.parse_workers),
+           "--tail-rate", str(args.tail_rate), "--tail-latency", str(args.tail_latency)]
+    if args.hedge:
+        cmd += ["--hedge", str(args.hedge)]
+    out = subprocess.run(cmd, capture_output=True, text=True)
+    if out.returncode != 0:
+        return {"bench": name, "size": size, "error": out.stderr.strip().splitlines()[-1:]}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='离线基准套件')
+    parser.add_argument('--sizes', type=str, default='100,10000,100000', help='离线基准的游戏数')
+    parser.add_argument('--network-sizes', type=str, default='100,1000',
+                        help='对桩服务器运行的游戏数（可加入 10000,100000，耗时较长）')
+    parser.add_argument('--latency', type=float, default=0.0, help='桩服务器每个请求的延迟（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='桩服务器 429 注入比例')
+    parser.add_argument('--tail-rate', type=float, default=0.0, help='桩服务器长尾请求比例')
+    parser.add_argument('--tail-latency', type=float, default=1.0, help='长尾请求额外延迟（秒）')
+    parser.add_argument('--hedge', type=float, default=None, help='开启对冲请求，值为对冲占比上限')
+    parser.add_argument('--reviews', type=int, default=30, help='步骤3每款游戏评论数')
+    parser.add_argument('--fetch-workers', type=int, default=1, help='步骤1下载线程数')
+    parser.add_argument('--parse-workers', type=int, default=0, help='页面解析子进程数')
+    parser.add_argument('--only', type=str, default=None, help='只运行指定基准（逗号分隔）')
+    parser.add_argument('--output', type=str, default=None, help='结果 JSON 输出路径')
+    parser.add_argument('--single', nargs=2, metavar=('BENCH', 'SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        result = run_single(args.single[0], int(args.single[1]), args)
+        # 被测代码会打印进度，结果放在最后一行
+        print(json.dumps(result, ensure_ascii=False))
+        return
+
+    only = set(args.only.split(",")) if args.only else None
+    plan = [(b, int(s)) for b in OFFLINE_BENCHES for s in args.sizes.split(",")]
+    plan += [(b, int(s)) for b in NETWORK_BENCHES for s in args.network_sizes.split(",")]
+    results = []
+    print(f"{'基准':<26}{'规模':>8}{'耗时(s)':>10}{'吞吐(/s)':>12}{'p50(ms)':>10}{'p99(ms)':>10}{'峰值RSS(MB)':>13}")
+    for name, size in plan:
+        if only and name not in only:
+            continue
+        r = run_in_subprocess(name, size, args)
+        results.append(r)
+        if "error" in r:
+            print(f"{name:<26}{size:>8}  失败: {r['error']}")
+            continue
+        lat = r.get("latency", {})
+        print(f"{name:<26}{size:>8}{r['seconds']:>10.2f}{r['throughput_per_s'] or 0:>12.1f}"
+              f"{lat.get('p50_ms', 0):>10.2f}{lat.get('p99_ms', 0):>10.2f}{r['peak_rss_mb'] or 0:>13.1f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"time": time.strftime("%Y-%m-%d %H:%M:%S"), "config": vars(args),
+                       "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存 -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
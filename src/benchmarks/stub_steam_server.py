@@ -0,0 +1,183 @@
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from synthetic import synthetic_game_row
+
+# 本地 Steam 桩服务器：按合成游戏列表返回搜索页、appdetails、商店页和评论页，
+# 可配置响应延迟和 429 注入比例，用于离线基准测试
+SEARCH_PAGE_SIZE = 25
+REVIEWS_PER_PAGE = 10
+POSTED_DATES = ["March 3, 2023", "12 October", "January 7", "5 May, 2024", "August 21"]
+REVIEW_TEXTS = [
+    "这游戏很好玩，推荐给朋友们",
+    "Great game, highly recommended for co-op sessions",
+    "优化一般，希望后续更新能改善",
+    "免费送稀有皮肤，加群 123456 私聊",
+    "Visit http://cheap-keys.example.com for cheap keys",
+    "外挂太多了，匹配体验很差",
+    "Solid gameplay loop but the story is weak",
+    "contact me: seller@example.com for boosting",
+]
+FILLER = "<script>var g_rgAppContextData = {};</script>" + "<div class='filler'>" + "x" * 2000 + "</div>"
+
+
+class StubSteamState:
+
+    def __init__(self, n_games, latency=0.0, error_rate=0.0, review_pages=5, seed=7,
+                 tail_rate=0.0, tail_latency=1.0):
+        rng = random.Random(seed)
+        self.games = [synthetic_game_row(i, rng) for i in range(n_games)]
+        self.by_appid = {g["appid"]: g for g in self.games}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.review_pages = review_pages
+        # 长尾：tail_rate 比例的请求额外等待 tail_latency 秒
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.rng = random.Random(seed + 1)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.injected_429 = 0
+
+    def extra_latency(self):
+        with self.lock:
+            return self.tail_latency if self.tail_rate and self.rng.random() < self.tail_rate else 0.0
+
+    def should_fail(self):
+        with self.lock:
+            self.requests += 1
+            if self.error_rate and self.rng.random() < self.error_rate:
+                self.injected_429 += 1
+                return True
+        return False
+
+
+def render_search_page(games):
+    rows = []
+    for g in games:
+        price = f"${g['original_price']}" if g["original_price"] else "Free"
+        if g["current_price"] != g["original_price"]:
+            price = f"${g['original_price']} ${g['current_price']}"
+        rows.append(
+            f'<a class="search_result_row" data-ds-appid="{g["appid"]}" href="#">'
+            f'<span class="title">{g["title"]}</span>'
+            f'<div class="search_released">{g["released"]}</div>'
+            f'<div class="search_price">{price}</div>'
+            f'<div class="search_tags">{"|".join(g["tags"].split(", ")[:3])}</div></a>'
+        )
+    return "<html><body><div id='search_resultsRows'>" + "".join(rows) + "</div></body></html>"
+
+
+def render_app_page(game):
+    tags = "".join(f'<a class="app_tag" href="#">{t}</a>' for t in game["tags"].split(", "))
+    return ("<html><head><title>" + game["title"] + "</title></head><body>"
+            "<div class='glance_ctn'><div class='glance_tags popular_tags'>" + tags + "</div></div>"
+            + FILLER * 20 + "</body></html>")
+
+
+def render_review_page(appid, page):
+    cards = []
+    for i in range(REVIEWS_PER_PAGE):
+        text = REVIEW_TEXTS[(int(appid) + page * REVIEWS_PER_PAGE + i) % len(REVIEW_TEXTS)]
+        cards.append(
+            "<div class='apphub_Card'>"
+            "<div class='apphub_CardContentAuthorName'>"
+            f"<a href='https://steamcommunity.com/profiles/7656{int(appid) * 100000 + page * REVIEWS_PER_PAGE + i:08d}/'>"
+            f"player{i}</a></div>"
+            f"<div class='found_helpful'>{(i * 7) % 13} people found this review helpful</div>"
+            f"<div class='apphub_CardTextContent'><div class='date_posted'>Posted: "
+            f"{POSTED_DATES[(page * REVIEWS_PER_PAGE + i) % len(POSTED_DATES)]}</div>{text}</div></div>"
+        )
+    return "<html><body>" + "".join(cards) + "</body></html>"
+
+
+def make_handler(state):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body, content_type="text/html; charset=utf-8"):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            delay = state.latency + state.extra_latency()
+            if delay:
+                time.sleep(delay)
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            parts = [p for p in url.path.split("/") if p]
+
+            if state.should_fail():
+                return self._send(429, "Too Many Requests", "text/plain")
+            if parts == ["search"]:
+                page = int(query.get("page", ["1"])[0])
+                # 不同榜单从不同位置轮转取游戏，页数多时各榜单互相重叠
+                list_key = "&".join(f"{k}={v[0]}" for k, v in sorted(query.items()) if k != "page")
+                shift = 0 if list_key == "filter=topsellers" else sum(map(ord, list_key)) * 7
+                start = (page - 1) * SEARCH_PAGE_SIZE + shift
+                games = [state.games[(start + i) % len(state.games)]
+                         for i in range(min(SEARCH_PAGE_SIZE, len(state.games)))]
+                return self._send(200, render_search_page(games))
+            if parts == ["api", "appdetails"]:
+                appid = query.get("appids", [""])[0]
+                game = state.by_appid.get(appid)
+                if game is None:
+                    return self._send(200, json.dumps({appid: {"success": False}}), "application/json")
+                data = {"price_overview": {"initial": int(game["original_price"] * 100),
+                                           "final": int(game["current_price"] * 100)}}
+                return self._send(200, json.dumps({appid: {"success": True, "data": data}}), "application/json")
+            if len(parts) == 2 and parts[0] == "app" and parts[1] in state.by_appid:
+                return self._send(200, render_app_page(state.by_appid[parts[1]]))
+            if len(parts) == 3 and parts[0] == "app" and parts[2] == "reviews":
+                page = int(query.get("p", ["1"])[0])
+                if page > state.review_pages:
+                    return self._send(200, "<html><body></body></html>")
+                return self._send(200, render_review_page(parts[1], page))
+            return self._send(404, "Not Found", "text/plain")
+
+    return Handler
+
+
+class StubSteamServer:
+    """在后台线程运行的桩服务器，支持 with 语句"""
+
+    def __init__(self, n_games, latency=0.0, error_rate=0.0, review_pages=5, port=0,
+                 tail_rate=0.0, tail_latency=1.0):
+        self.state = StubSteamState(n_games, latency, error_rate, review_pages,
+                                    tail_rate=tail_rate, tail_latency=tail_latency)
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), make_handler(self.state))
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def point_modules_here(self):
+        """把抓取模块的地址常量指向本服务器"""
+        import steam_data_extractor
+        import comments.simple_steam_crawler_easy as crawler
+        steam_data_extractor.BASE_SEARCH = self.base_url + "/search/"
+        steam_data_extractor.APP_URL = self.base_url + "/app/{appid}/"
+        steam_data_extractor.APPDETAILS_API = self.base_url + "/api/appdetails"
+        crawler.REVIEWS_URL = self.base_url + "/app/{appid}/reviews/"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,40 @@
+import csv
+import os
+import random
+
+TAG_POOL = [
+    "Action", "RPG", "Strategy", "Simulation", "Adventure", "Indie", "FPS",
+    "Shooter", "Multiplayer", "Singleplayer", "Open World", "Co-op", "Casual",
+    "Survival", "Horror", "Puzzle", "Sports", "Racing", "Sandbox", "Story Rich"
+]
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+PRICES = [0.0, 4.99, 9.99, 14.99, 19.99, 29.99, 39.99, 49.99, 59.99, 69.99, 99.99, 129.99]
+
+
+def synthetic_game_row(i, rng):
+    original = rng.choice(PRICES)
+    if original > 0 and rng.random() < 0.4:
+        current = round(original * rng.choice([0.25, 0.5, 0.66, 0.75, 0.9]), 2)
+    else:
+        current = original
+    return {
+        "appid": str(100000 + i),
+        "title": f"Synthetic Game {i}",
+        "released": f"{rng.randint(1, 28)} {rng.choice(MONTHS)}, {rng.randint(2005, 2025)}",
+        "current_price": current,
+        "original_price": original,
+        "tags": ", ".join(rng.sample(TAG_POOL, rng.randint(3, 12)))
+    }
+
+
+def write_synthetic_games_csv(filename, n_rows, seed=42):
+    """生成与清洗后数据同结构的合成 CSV，用于离线性能测试"""
+    rng = random.Random(seed)
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    with open(filename, "w", newline='', encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=["appid", "title", "released", "current_price",
+                                               "original_price", "tags"])
+        writer.writeheader()
+        for i in range(n_rows):
+            writer.writerow(synthetic_game_row(i, rng))
+    return filename
@@ -1,8 +1,16 @@
 import csv
 import re
 import os
+import sys
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if os.path.join(BASE_DIR, "src") not in sys.path:
+    sys.path.insert(0, os.path.join(BASE_DIR, "src"))
+
+from aggregate_cube import update_cube_file
+from csv_manifest import write_manifest, GAME_COLUMNS
+from records import Game
+
 INPUT_FILE = os.path.join(BASE_DIR, "data", "steam_topsellers_simple.csv")
 OUTPUT_FILE = os.path.join(BASE_DIR, "data", "steam_topsellers_simple_cleaned.csv")
 
@@ -53,49 +61,50 @@ def clean_tags(tags_str):
 
 
 def is_valid(row):
-    if not row['appid'] or not row['appid'].isdigit():
+    if not row.appid or not row.appid.isdigit():
         return False
-    if not row['title']:
+    if not row.title:
         return False
     return True
 
 
+def clean_row(row):
+    """清洗单条记录（CSV 行字典或 Game），无效时返回 None"""
+    game = Game(
+        appid=str(row.get('appid', '')).strip(),
+        title=clean_title(row.get('title', '')),
+        released=clean_date(row.get('released', '')),
+        current_price=clean_price(row.get('current_price', '')),
+        original_price=clean_price(row.get('original_price', '')),
+        tags=clean_tags(row.get('tags', ''))
+    )
+    return game if is_valid(game) else None
+
+
 def clean_data():
+    # 边读边清洗去重，内存中只保留清洗后的 Game 记录
+    seen_appids = set()
+    unique_data = []
     try:
         with open(INPUT_FILE, 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            raw_data = list(reader)
+            for row in csv.DictReader(f):
+                cleaned = clean_row(row)
+                if cleaned and cleaned.appid not in seen_appids:
+                    seen_appids.add(cleaned.appid)
+                    unique_data.append(cleaned)
     except FileNotFoundError:
         print(f"错误：找不到文件 {INPUT_FILE}")
         return
     except Exception as e:
         print(f"错误：读取文件失败 - {e}")
         return
-    cleaned_data = []
-    for row in raw_data:
-        clean_row = {
-            'appid': str(row.get('appid', '')).strip(),
-            'title': clean_title(row.get('title', '')),
-            'released': clean_date(row.get('released', '')),
-            'current_price': clean_price(row.get('current_price', '')),
-            'original_price': clean_price(row.get('original_price', '')),
-            'tags': clean_tags(row.get('tags', ''))
-        }
-        if is_valid(clean_row):
-            cleaned_data.append(clean_row)
-    seen_appids = set()
-    unique_data = []
-    for row in cleaned_data:
-        appid = row['appid']
-        if appid not in seen_appids:
-            seen_appids.add(appid)
-            unique_data.append(row)
     with open(OUTPUT_FILE, 'w', newline='', encoding='utf-8-sig') as f:
-        fieldnames = ['appid', 'title', 'released', 'current_price', 
-                     'original_price', 'tags']
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer = csv.DictWriter(f, fieldnames=Game.field_names(), extrasaction='ignore')
         writer.writeheader()
         writer.writerows(unique_data)
+    write_manifest(OUTPUT_FILE, unique_data, GAME_COLUMNS)
+    added, changed, removed = update_cube_file(OUTPUT_FILE, unique_data)
+    print(f"聚合立方体已更新：新增 {added}，变化 {changed}，移除 {removed}")
 
 
 if __name__ == "__main__":
@@ -1,123 +1,195 @@
+import calendar
+import math
 import re
-import requests
 import time
+from datetime import date
 from bs4 import BeautifulSoup
 
-HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
+from perf_metrics import retry_get, sleep
+from parse_pool import parse
+import threat_rules
+from records import Review, ReviewBatch, SuspiciousReview
 
-EXTERNAL_LINKS = [r"https?://[^\s]+", r"www\.[^\s]+\.[a-zA-Z]{2,}"]
-SUSPICIOUS_KEYWORDS = [
-    "外挂", "挂机", "脚本", "破解", "免费获得", "代挂",
-    "hack", "cheat", "bot", "script", "crack",
-    "免费送", "限时优惠", "点击领取", "立即获得",
-    "稀有皮肤", "免费皮肤", "开箱", "抽奖",
-    "代练", "低价出售", "便宜卖", "代打",
-    "加群", "进群", "关注", "私聊", "联系我"
-]
-CONTACT_PATTERNS = [r"1[3-9]\d{9}", r"[\w._%+-]+@[\w.-]+\.[a-zA-Z]{2,}"]
+HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
+REVIEWS_URL = "https://steamcommunity.com/app/{appid}/reviews/"
+MONTHS = {name: i + 1 for i, name in enumerate(
+    ["january", "february", "march", "april", "may", "june",
+     "july", "august", "september", "october", "november", "december"])}
 
 
-def _find_regex(patterns, text, flags=0):
-    found = []
-    for p in patterns:
-        found.extend(re.findall(p, text, flags))
-    return found
+def detect_threats(text):
+    """按当前威胁规则包检测（链接、联系方式、关键词见 data/threat_rules.json）"""
+    return threat_rules.current().detect(text)
 
 
-def detect_threats(text):
-    text = text or ""
-    links = _find_regex(EXTERNAL_LINKS, text, re.IGNORECASE)
-    contacts = _find_regex(CONTACT_PATTERNS, text)
-    keywords = [k for k in SUSPICIOUS_KEYWORDS if k.lower() in text.lower()]
-    return {
-        'links': len(links),
-        'keywords': len(keywords),
-        'contacts': len(contacts),
-        'found_items': links + contacts + keywords
-    }
+def parse_posted_date(text, today=None):
+    """解析评论卡片上的发布日期（"Posted: March 3, 2023"、"Posted: 3 March"、"发布于：2023 年 3 月 3 日"），
+    返回 YYYY-MM-DD；当年的评论页面不写年份，推出的日期在今天之后时算作去年。无法解析时返回空串"""
+    today = today or date.today()
+    m = re.search(r'(?:(\d{4})\s*年\s*)?(\d{1,2})\s*月\s*(\d{1,2})\s*日', text)
+    if m:
+        year, month, day = m.group(1), int(m.group(2)), int(m.group(3))
+    else:
+        m = (re.search(r'([A-Za-z]+)\.?\s+(\d{1,2})(?:,\s*(\d{4}))?', text)
+             or re.search(r'(\d{1,2})\s+([A-Za-z]+)\.?(?:,?\s*(\d{4}))?', text))
+        if not m:
+            return ''
+        name, day = (m.group(1), m.group(2)) if not m.group(1).isdigit() else (m.group(2), m.group(1))
+        month = next((i for full, i in MONTHS.items() if len(name) >= 3 and full.startswith(name.lower())), None)
+        if month is None:
+            return ''
+        year, day = m.group(3), int(day)
+    try:
+        posted = date(int(year) if year else today.year, month, day)
+        if not year and posted > today:
+            posted = posted.replace(year=today.year - 1)
+    except ValueError:
+        return ''
+    return posted.isoformat()
 
 
-def fetch_reviews(app_id, max_reviews=30):
+def parse_review_page(content, page):
+    """解析一页评论，页面没有评论卡片时返回 None"""
+    soup = BeautifulSoup(content, 'html.parser')
+    review_containers = soup.select('div.apphub_Card')
+    if not review_containers:
+        return None
     reviews = []
-    url = f"https://steamcommunity.com/app/{app_id}/reviews/"
+    for container in review_containers:
+        content_elem = container.select_one('div.apphub_CardTextContent')
+        if not content_elem:
+            continue
+        text = content_elem.get_text(strip=True)
+        if not text:
+            continue
+        helpful = 0
+        helpful_elem = container.select_one('div.found_helpful')
+        if helpful_elem:
+            helpful_text = helpful_elem.get_text()
+            numbers = re.findall(r'\d+', helpful_text)
+            if numbers:
+                helpful = int(numbers[0])
+        language = 'unknown'
+        if any(ord(char) > 127 for char in text[:100]):
+            if any('\u4e00' <= char <= '\u9fff' for char in text[:100]):
+                language = 'chinese'
+            else:
+                language = 'other'
+        else:
+            language = 'english'
+        # 评论者主页链接作为评论者标识，没有链接时用显示名
+        author = ''
+        author_elem = container.select_one('div.apphub_CardContentAuthorName a')
+        if author_elem:
+            author = author_elem.get('href') or author_elem.get_text(strip=True)
+        posted = ''
+        posted_elem = container.select_one('div.date_posted')
+        if posted_elem:
+            posted = parse_posted_date(posted_elem.get_text(strip=True))
+        reviews.append(Review(text, page, helpful, language, author, posted))
+    return reviews
+
+
+def wilson_interval(k, n, z=1.96):
+    """k/n 的 Wilson 置信区间，n 较小或比例接近 0 时比正态近似可靠"""
+    if n == 0:
+        return 0.0, 1.0
+    p = k / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+class AdaptiveSampling:
+    """自适应评论采样：至少取 min_reviews 条，之后每抓一页就更新威胁率的置信区间，
+    区间宽度不超过 target_width 时停止翻页，最多 max_reviews 条。
+    干净的游戏很快满足条件；威胁率接近一半时区间最宽，会一直采到上限"""
+
+    def __init__(self, min_reviews=20, max_reviews=200, target_width=0.1, z=1.96):
+        self.min_reviews = min_reviews
+        self.max_reviews = max_reviews
+        self.target_width = target_width
+        self.z = z
+
+    def should_stop(self, suspicious, total):
+        if total < self.min_reviews:
+            return False
+        low, high = wilson_interval(suspicious, total, self.z)
+        return high - low <= self.target_width
+
+    def params(self):
+        return {"min_reviews": self.min_reviews, "max_reviews": self.max_reviews,
+                "target_width": self.target_width, "z": self.z}
+
+
+def fetch_reviews(app_id, max_reviews=30, on_page=None):
+    """按页抓取评论；on_page(reviews) 在每页之后调用，返回 False 时停止翻页"""
+    reviews = ReviewBatch()
+    url = REVIEWS_URL.format(appid=app_id)
     page = 1
     
     try:
         while len(reviews) < max_reviews:
             params = {'browsefilter': 'mostrecent', 'filterLanguage': 'schinese', 'p': page}
-            r = requests.get(url, params=params, headers=HEADERS, timeout=15)
+            r = retry_get("reviews", url, params=params, headers=HEADERS, timeout=15)
             if r.status_code != 200:
                 break
-            soup = BeautifulSoup(r.content, 'html.parser')
-            review_containers = soup.select('div.apphub_Card')
-            if not review_containers:
+            page_reviews = parse("reviews", r.content, page)
+            if page_reviews is None:
+                break
+            reviews.extend(page_reviews[:max_reviews - len(reviews)])
+            if on_page is not None and not on_page(reviews):
                 break
-            for container in review_containers:
-                if len(reviews) >= max_reviews:
-                    break
-                content_elem = container.select_one('div.apphub_CardTextContent')
-                if not content_elem:
-                    continue
-                text = content_elem.get_text(strip=True)
-                if not text:
-                    continue
-                helpful = 0
-                helpful_elem = container.select_one('div.found_helpful')
-                if helpful_elem:
-                    helpful_text = helpful_elem.get_text()
-                    import re
-                    numbers = re.findall(r'\d+', helpful_text)
-                    if numbers:
-                        helpful = int(numbers[0])
-                language = 'unknown'
-                if any(ord(char) > 127 for char in text[:100]):
-                    if any('\u4e00' <= char <= '\u9fff' for char in text[:100]):
-                        language = 'chinese'
-                    else:
-                        language = 'other'
-                else:
-                    language = 'english'
-                reviews.append({
-                    'content': text, 
-                    'page': page,
-                    'helpful': helpful,
-                    'language': language
-                })
             page += 1
-            time.sleep(1.5)
+            sleep(1.5, "reviews")
         return reviews
     except Exception as e:
         print(f"抓取评论时出错: {e}")
         return reviews
 
 
-def analyze_game_threats(app_id, game_title, max_reviews=30):
-    reviews = fetch_reviews(app_id, max_reviews)
+def analyze_game_threats(app_id, game_title, max_reviews=30, trends=None, sampling=None):
+    """trends 为 threat_trends.ThreatTrends 时，把本次评论并入该游戏的长期趋势；
+    sampling 为 AdaptiveSampling 时按置信区间决定抓取多少条（max_reviews 被其上限取代）"""
+    # 边抓边检测，自适应采样据此判断何时停止，后面的统计直接复用
+    detected = []
+    suspicious_so_far = [0]
+
+    def on_page(batch):
+        for i in range(len(detected), len(batch)):
+            threats = detect_threats(batch.content[i])
+            detected.append(threats)
+            suspicious_so_far[0] += 1 if threats.any() else 0
+        return sampling is None or not sampling.should_stop(suspicious_so_far[0], len(detected))
+
+    reviews = fetch_reviews(app_id, sampling.max_reviews if sampling else max_reviews, on_page)
     if not reviews:
         return None
+    from threat_trends import review_key
+    trend = trends.new_trend(app_id) if trends is not None else None
     threat_stats = {'links': 0, 'keywords': 0, 'contacts': 0}
     language_stats = {'chinese': 0, 'english': 0, 'other': 0, 'unknown': 0}
     total_helpful = 0
     suspicious_reviews = []
     for i, review in enumerate(reviews):
-        threats = detect_threats(review['content'])
-        for key in threat_stats:
-            threat_stats[key] += threats[key]
-        lang = review.get('language', 'unknown')
-        if lang in language_stats:
-            language_stats[lang] += 1
-        else:
-            language_stats['unknown'] += 1
-        total_helpful += review.get('helpful', 0)
-        if threats['links'] or threats['keywords'] or threats['contacts']:
-            suspicious_reviews.append({
-                'index': i + 1,
-                'content': review['content'][:100] + '...' if len(review['content']) > 100 else review['content'],
-                'page': review['page'],
-                'helpful': review.get('helpful', 0),
-                'language': review.get('language', 'unknown'),
-                'threats': threats
-            })
+        threats = detected[i] if i < len(detected) else detect_threats(review.content)
+        threat_stats['links'] += threats.links
+        threat_stats['keywords'] += threats.keywords
+        threat_stats['contacts'] += threats.contacts
+        language_stats[review.language] += 1
+        total_helpful += review.helpful
+        if trend is not None:
+            # 同一条评论每次运行都会被重新抓到，按评论键去重；按发布日期分桶
+            ts = calendar.timegm(time.strptime(review.posted, "%Y-%m-%d")) if review.posted else None
+            trend.add_review(review_key(review.author, review.content), review.author, threats, ts)
+        if threats.any():
+            content = review.content[:100] + '...' if len(review.content) > 100 else review.content
+            suspicious_reviews.append(SuspiciousReview(i + 1, content, review.page, review.helpful,
+                                                       review.language, threats))
+    if trend is not None:
+        trends.merge_game(app_id, trend)
+    ci_low, ci_high = wilson_interval(len(suspicious_reviews), len(reviews))
     return {
         'appid': app_id,
         'title': game_title,
@@ -125,6 +197,7 @@ def analyze_game_threats(app_id, game_title, max_reviews=30):
         'suspicious_reviews': len(suspicious_reviews),
         'threat_stats': threat_stats,
         'threat_rate': len(suspicious_reviews) / len(reviews) if reviews else 0,
+        'threat_rate_ci': (ci_low, ci_high),
         'language_stats': language_stats,
         'avg_helpful': total_helpful / len(reviews) if reviews else 0,
         'details': suspicious_reviews[:5]
@@ -0,0 +1,154 @@
+import csv
+import hashlib
+import json
+import os
+
+# 每个输出 CSV 旁边写一份小的 JSON 摘要（行数、求和、极值、直方图、内容哈希），
+# 统计脚本直接读摘要，不必重新解析整份 CSV
+MANIFEST_VERSION = 1
+HEAD_ROWS = 10
+
+PRICE_EDGES = [0, 10, 20, 30, 50, 60, 100]
+RATE_EDGES = [0, 5, 10, 20, 50]
+COUNT_EDGES = [0, 1, 10, 100, 1000]
+
+GAME_COLUMNS = {"current_price": PRICE_EDGES, "original_price": PRICE_EDGES, "discounts": RATE_EDGES}
+COMMENT_COLUMNS = {"total_reviews": COUNT_EDGES, "suspicious_reviews": COUNT_EDGES,
+                   "threat_rate": RATE_EDGES, "threat_rate_ci_low": RATE_EDGES,
+                   "threat_rate_ci_high": RATE_EDGES, "chinese_reviews": COUNT_EDGES,
+                   "english_reviews": COUNT_EDGES}
+SUSPICIOUS_COLUMNS = {"helpful": COUNT_EDGES, "link_count": COUNT_EDGES,
+                      "keyword_count": COUNT_EDGES, "contact_count": COUNT_EDGES}
+
+
+def manifest_path_for(csv_file):
+    root, _ = os.path.splitext(str(csv_file))
+    return root + ".manifest.json"
+
+
+def to_number(value):
+    """与 pd.to_numeric(errors='coerce') 类似，百分号结尾的字符串按数值处理"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).strip().rstrip("%"))
+    except (TypeError, ValueError):
+        return None
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _new_column(edges):
+    return {"count": 0, "sum": 0.0, "min": None, "max": None,
+            "zeros": 0, "positives": 0, "sum_positive": 0.0, "min_positive": None,
+            "histogram": {"edges": list(edges), "counts": [0] * (len(edges) + 1)}}
+
+
+def _add_value(col, v):
+    col["count"] += 1
+    col["sum"] += v
+    col["min"] = v if col["min"] is None else min(col["min"], v)
+    col["max"] = v if col["max"] is None else max(col["max"], v)
+    if v == 0:
+        col["zeros"] += 1
+    elif v > 0:
+        col["positives"] += 1
+        col["sum_positive"] += v
+        col["min_positive"] = v if col["min_positive"] is None else min(col["min_positive"], v)
+    # 分箱：<= edges[0], (edges[0], edges[1]], ..., > edges[-1]
+    edges = col["histogram"]["edges"]
+    i = 0
+    while i < len(edges) and v > edges[i]:
+        i += 1
+    col["histogram"]["counts"][i] += 1
+
+
+def build_manifest(rows, columns):
+    """单次遍历 rows，返回摘要字典（不含文件信息）"""
+    stats = {}
+    fieldnames = None
+    head = []
+    row_count = 0
+    for row in rows:
+        if fieldnames is None:
+            fieldnames = list(row.keys())
+            stats = {name: _new_column(edges) for name, edges in columns.items() if name in row}
+        row_count += 1
+        if len(head) < HEAD_ROWS:
+            head.append({k: "" if v is None else str(v) for k, v in row.items()})
+        for name, col in stats.items():
+            v = to_number(row.get(name))
+            if v is not None:
+                _add_value(col, v)
+    return {"version": MANIFEST_VERSION, "row_count": row_count,
+            "fieldnames": fieldnames or [], "columns": stats, "head": head}
+
+
+def _stamp(manifest, csv_file, content_hash=None):
+    st = os.stat(csv_file)
+    manifest["source"] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                          "sha256": content_hash or file_hash(csv_file)}
+    return manifest
+
+
+def _dump(manifest, csv_file):
+    path = manifest_path_for(csv_file)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def write_manifest(csv_file, rows, columns):
+    """写出 CSV 后调用：rows 为刚写入的行"""
+    manifest = _stamp(build_manifest(rows, columns), csv_file)
+    _dump(manifest, csv_file)
+    return manifest
+
+
+def load_manifest(csv_file):
+    """返回仍然有效的摘要；大小/修改时间变化时核对内容哈希，过期返回 None"""
+    try:
+        with open(manifest_path_for(csv_file), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        st = os.stat(csv_file)
+    except (FileNotFoundError, ValueError):
+        return None
+    source = manifest.get("source") or {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    if source.get("size") == st.st_size and source.get("mtime_ns") == st.st_mtime_ns:
+        return manifest
+    if source.get("size") != st.st_size:
+        return None
+    content_hash = file_hash(csv_file)
+    if content_hash != source.get("sha256"):
+        return None
+    _dump(_stamp(manifest, csv_file, content_hash), csv_file)
+    return manifest
+
+
+def scan_manifest(csv_file, columns):
+    with open(csv_file, "r", encoding="utf-8-sig", newline="") as f:
+        manifest = build_manifest(csv.DictReader(f), columns)
+    manifest = _stamp(manifest, csv_file)
+    _dump(manifest, csv_file)
+    return manifest
+
+
+def summarize(csv_file, columns):
+    """优先读摘要，缺失或过期时扫描一次 CSV 并重新生成"""
+    return load_manifest(csv_file) or scan_manifest(csv_file, columns)
+
+
+def count_above(col, threshold):
+    """threshold 必须是该列直方图的分界点"""
+    hist = col["histogram"]
+    i = hist["edges"].index(threshold)
+    return sum(hist["counts"][i + 1:])
@@ -11,17 +11,13 @@ BASE_DIR = Path(__file__).parent.parent
 DATA_DIR = BASE_DIR / "data"
 sys.path.insert(0, str(BASE_DIR / "src"))
 
-from steam_data_extractor import (
-    fetch_search_page,
-    parse_search_html,
-    get_price_from_api,
-    get_tags_from_app_page,
-    merge_tags,
-    price_fallback_from_text,
-    save_csv
-)
-from clean.data_cleaner import clean_data
-from comments.simple_steam_crawler_easy import analyze_game_threats
+# 各步骤的重依赖（requests/bs4/pandas/matplotlib）在对应步骤内按需导入，
+# 单独执行某一步时不必加载其他步骤的依赖
+from perf_metrics import METRICS, step_timer, sleep
+import page_archive
+import parse_pool
+import threat_rules
+from price_history import parse_time_arg
 
 
 class SteamAnalysisPipeline:
@@ -31,58 +27,194 @@ class SteamAnalysisPipeline:
         self.cleaned_csv = DATA_DIR / "steam_topsellers_simple_cleaned.csv"
         self.comment_analysis_csv = DATA_DIR / "comment_analysis_results.csv"
         self.suspicious_reviews_csv = DATA_DIR / "suspicious_reviews_details.csv"
+        self.list_ranks_csv = DATA_DIR / "search_list_ranks.csv"
+        self.step_cache_file = DATA_DIR / ".pipeline_cache.json"
+        self.storage = "csv"
+        self.db_file = DATA_DIR / "steam.db"
+        self.price_history_dir = DATA_DIR / "price_history"
+        self.threat_trends_file = DATA_DIR / "threat_trends.json"
+        self.metrics_dir = DATA_DIR / "metrics"
+        self.profile_dir = None
+        self.fetch_workers = 1
+        self.review_sampling = None
         self.games_data = []
 
-    def step1_extract_games(self, pages=1):
-        print("\n--- 步骤 1/4：抓取 Steam 游戏数据 ---")
-        all_items = []
-        for p in range(1, pages + 1):
-            print(f"抓取搜索页 {p} ...")
-            html = fetch_search_page(page=p, filter_name="topsellers")
-            items = parse_search_html(html)
-            all_items.extend(items)
-            time.sleep(0.2)
+    def run_step(self, step, func, *args, **kwargs):
+        """执行一个步骤并记录墙钟/CPU 时间；设置了 profile_dir 时输出 cProfile 结果"""
+        with step_timer(step, self.profile_dir):
+            return func(*args, **kwargs)
 
-        out = []
-        for i, it in enumerate(all_items, 1):
-            appid = it.get("appid", "")
-            title = it.get("title", "")
-            print(f"[{i}/{len(all_items)}] {title[:50]} (appid={appid})")
-            record = {
-                "appid": appid,
-                "title": title,
-                "released": it.get("released", ""),
-                "current_price": "",
-                "original_price": "",
-                "tags": "",
-                "release_date": it.get("released", ""),
-                "review_score": "",
-                "developer": ""
-            }
-            if appid:
-                price_info = get_price_from_api(appid, cc="US", lang="en")
-                if price_info and price_info.get("final") is not None:
-                    record["current_price"] = str(price_info.get("final"))
-                    record["original_price"] = str(price_info.get("initial")) if price_info.get(
-                        "initial") is not None else ""
-                else:
-                    cur, orig = price_fallback_from_text(it.get("price_text", ""))
-                    record["current_price"] = cur
-                    record["original_price"] = orig
-                tags_page = get_tags_from_app_page(appid)
-                merged = merge_tags(it.get("tags_text", ""), tags_page)
-                record["tags"] = merged
+    def open_sink(self):
+        """按 storage 配置打开输出存储（csv / sqlite / both）"""
+        from storage import open_sink
+        return open_sink(self.storage, {
+            "games": self.raw_csv,
+            "comment_analysis": self.comment_analysis_csv,
+            "suspicious_reviews": self.suspicious_reviews_csv,
+            "list_ranks": self.list_ranks_csv,
+        }, self.db_file)
+
+    def load_comment_results(self):
+        if self.storage == "sqlite":
+            from storage import SqliteSink
+            with SqliteSink(self.db_file) as sink:
+                return sink.rows("comment_analysis")
+        return self._read_rows(self.comment_analysis_csv)
+
+    def record_prices(self, games):
+        """把本次抓取的价格追加到价格历史；回放归档时不是新的观测，跳过"""
+        archive = page_archive.current()
+        if archive is not None and archive.replay:
+            return
+        from price_history import PriceHistory
+        changed = PriceHistory(self.price_history_dir).record(games, cc="US")
+        print(f"价格历史：{changed} 款游戏价格有变化")
+
+    def open_trends(self):
+        """评论威胁趋势的累加器；回放归档时评论已经统计过，返回 None"""
+        archive = page_archive.current()
+        if archive is not None and archive.replay:
+            return None
+        from threat_trends import ThreatTrends
+        return ThreatTrends(self.threat_trends_file)
+
+    def load_threat_rules(self):
+        """评论分析前加载威胁规则包，失败时报告错误并返回 False"""
+        try:
+            threat_rules.current()
+            return True
+        except (OSError, ValueError) as e:
+            print(f"错误：无法加载威胁规则包 {threat_rules.pack_file()} - {e}")
+            return False
+
+    def write_metrics(self):
+        rules = threat_rules.loaded()
+        if rules is not None and rules.texts:
+            METRICS.record_rules(rules.stats())
+        METRICS.write_json(self.metrics_dir / "metrics.json")
+        METRICS.write_prometheus(self.metrics_dir / "metrics.prom")
+        print(f"性能指标已保存 -> {self.metrics_dir}")
+
+    def _read_rows(self, path, record_type=None):
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f)
+            return [record_type.from_row(row) for row in reader] if record_type else list(reader)
+
+    def run_cached_step(self, cache, step, func, inputs=(), params=None, outputs=(),
+                        optional_outputs=(), load_cached=None, max_age=None):
+        """输入哈希与参数未变且输出完好时跳过 func，返回 (结果, 是否命中缓存)"""
+        key = cache.step_key(step, inputs, params)
+        if cache.is_fresh(step, key, max_age):
+            print(f"\n--- 步骤 {step}/4：输入未变化，使用缓存结果 ---")
+            return (load_cached() if load_cached else None), True
+        cache.invalidate(step)
+        result = self.run_step(step, func)
+        # 没有产出（空结果或输出文件缺失）时不记录，下次照常执行
+        if (result is None or result) and all(Path(p).exists() for p in outputs):
+            cache.record(step, key, list(outputs) + [p for p in optional_outputs if Path(p).exists()])
+        return result, False
+
+    def fetch_search_items(self, pages=1, lists=("topsellers",)):
+        """并发抓取各榜单的前 pages 页，按 appid 去重，同一款游戏只补全一次。
+        返回 (去重后的搜索结果, 每个 appid 在各榜单上的排名行)"""
+        from concurrent.futures import ThreadPoolExecutor
+        from steam_data_extractor import fetch_search_page, parse_search_html
+
+        def fetch(job):
+            list_name, p = job
+            print(f"抓取搜索页 {list_name} {p} ...")
+            try:
+                items = parse_search_html(fetch_search_page(page=p, filter_name=list_name))
+            except Exception as e:
+                # 单页失败（重试后仍被限流等）不影响其他页
+                print(f"抓取搜索页 {list_name} {p} 失败: {e}")
+                return None
+            sleep(0.2, "search")
+            return items
+
+        jobs = [(list_name, p) for list_name in lists for p in range(1, pages + 1)]
+        workers = max(1, min(len(jobs), max(self.fetch_workers, len(lists))))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pages_items = list(executor.map(fetch, jobs))
+
+        unique = {}
+        ranks = []
+        positions = dict.fromkeys(lists, 0)
+        rows = 0
+        broken = set()
+        for (list_name, _), items in zip(jobs, pages_items):
+            if items is None:
+                # 缺了一页后该榜单后续的排名无法确定，只保留游戏本身
+                broken.add(list_name)
+                continue
+            for it in items:
+                rows += 1
+                positions[list_name] += 1
+                # 没有 appid 的条目无法去重，原样保留
+                key = it.appid or f"#{rows}"
+                unique.setdefault(key, it)
+                if it.appid and list_name not in broken:
+                    ranks.append({"appid": it.appid, "list_name": list_name, "rank": positions[list_name]})
+        if len(lists) > 1:
+            print(f"{len(lists)} 个榜单共 {rows} 行，去重后 {len(unique)} 款游戏")
+        return list(unique.values()), ranks
+
+    def enrich_item(self, it):
+        """用 appdetails 价格和商店页标签补全一条搜索结果"""
+        from steam_data_extractor import (
+            get_price_from_api,
+            get_tags_from_app_page,
+            merge_tags,
+            price_fallback_from_text
+        )
+        from records import Game
+        appid = it.appid
+        record = Game(appid, it.title, it.released)
+        if appid:
+            price_info = get_price_from_api(appid, cc="US", lang="en")
+            if price_info and price_info.get("final") is not None:
+                record.current_price = str(price_info.get("final"))
+                record.original_price = str(price_info.get("initial")) if price_info.get(
+                    "initial") is not None else ""
             else:
-                cur, orig = price_fallback_from_text(it.get("price_text", ""))
-                record["current_price"] = cur
-                record["original_price"] = orig
-                record["tags"] = it.get("tags_text", "")
-            out.append(record)
-            time.sleep(1.0)
-
-        save_csv(out, str(self.raw_csv))
+                record.current_price, record.original_price = price_fallback_from_text(it.price_text)
+            tags_page = get_tags_from_app_page(appid)
+            record.tags = merge_tags(it.tags_text, tags_page)
+        else:
+            record.current_price, record.original_price = price_fallback_from_text(it.price_text)
+            record.tags = it.tags_text
+        return record
+
+    def enrich_items(self, all_items):
+        """逐条补全搜索结果；fetch_workers > 1 时由多个下载线程并发补全，结果保持原顺序"""
+        def enrich(job):
+            i, it = job
+            print(f"[{i}/{len(all_items)}] {it.title[:50]} (appid={it.appid})")
+            record = self.enrich_item(it)
+            sleep(1.0, "enrich")
+            return record
+
+        jobs = list(enumerate(all_items, 1))
+        if self.fetch_workers <= 1:
+            return [enrich(job) for job in jobs]
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as executor:
+            return list(executor.map(enrich, jobs))
+
+    def step1_extract_games(self, pages=1, lists=("topsellers",)):
+        print("\n--- 步骤 1/4：抓取 Steam 游戏数据 ---")
+        from steam_data_extractor import save_csv
+        all_items, ranks = self.fetch_search_items(pages, lists)
+
+        out = self.enrich_items(all_items)
+
+        with self.open_sink() as sink:
+            save_csv(out, str(self.raw_csv), sink)
+            sink.write("list_ranks", ranks)
+            target = sink.describe("games")
+        self.record_prices(out)
         self.games_data = out
-        print(f"完成：已保存 {len(out)} 条游戏数据 -> {self.raw_csv.name}")
+        print(f"完成：已保存 {len(out)} 条游戏数据 -> {target}")
         return out
 
     def step2_clean_data(self):
@@ -93,7 +225,7 @@ class SteamAnalysisPipeline:
         cleaner.INPUT_FILE = str(self.raw_csv)
         cleaner.OUTPUT_FILE = str(self.cleaned_csv)
         try:
-            clean_data()
+            cleaner.clean_data()
             print(f"完成：清洗后的数据已保存 -> {self.cleaned_csv.name}")
         finally:
             if original_input is not None:
@@ -103,89 +235,115 @@ class SteamAnalysisPipeline:
 
     def step3_analyze_comments(self, max_games=5, max_reviews_per_game=20):
         print("\n--- 步骤 3/4：分析游戏评论（前 {0} 款） ---".format(max_games))
+        from itertools import islice
+        from comments.simple_steam_crawler_easy import analyze_game_threats
         try:
             with open(self.cleaned_csv, 'r', encoding='utf-8-sig') as f:
-                games = list(csv.DictReader(f))[:max_games]
+                games = list(islice(csv.DictReader(f), max_games))
         except FileNotFoundError:
             print(f"错误：找不到清洗后的文件 {self.cleaned_csv}")
             return []
+        if not self.load_threat_rules():
+            return []
 
-        results = []
-        for i, game in enumerate(games, 1):
+        def analyze(job):
+            i, game = job
             app_id = game.get('appid', '').strip()
             title = game.get('title', '').strip()
             if not app_id or not title:
-                continue
+                return None
             print(f"[{i}/{len(games)}] 分析：{title}")
-            result = analyze_game_threats(app_id, title, max_reviews_per_game)
+            result = analyze_game_threats(app_id, title, max_reviews_per_game, trends, self.review_sampling)
             if result:
-                results.append(result)
-                print(f"  完成：分析 {result['total_reviews']} 条评论，{result['suspicious_reviews']} 条可疑（{result['threat_rate'] * 100:.1f}%）")
+                low, high = result['threat_rate_ci']
+                print(f"  完成：分析 {result['total_reviews']} 条评论，{result['suspicious_reviews']} 条可疑"
+                      f"（{result['threat_rate'] * 100:.1f}%，95%区间 {low * 100:.1f}-{high * 100:.1f}%）")
             else:
                 print("  无法获取评论")
-            time.sleep(2)
+            sleep(2, "reviews")
+            return result
+
+        trends = self.open_trends()
+        jobs = list(enumerate(games, 1))
+        if self.fetch_workers <= 1:
+            analyzed = [analyze(job) for job in jobs]
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=self.fetch_workers) as executor:
+                analyzed = list(executor.map(analyze, jobs))
+        results = [r for r in analyzed if r]
+        if trends is not None:
+            trends.save()
 
+        self.save_comment_results(results)
+        return results
+
+    def save_comment_results(self, results):
         if results:
-            with open(self.comment_analysis_csv, 'w', newline='', encoding='utf-8-sig') as f:
-                fieldnames = ['appid', 'title', 'total_reviews', 'suspicious_reviews',
-                              'threat_rate', 'links', 'keywords', 'contacts', 'avg_helpful',
-                              'chinese_reviews', 'english_reviews']
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                for r in results:
-                    writer.writerow({
-                        'appid': r['appid'],
-                        'title': r['title'],
-                        'total_reviews': r['total_reviews'],
-                        'suspicious_reviews': r['suspicious_reviews'],
-                        'threat_rate': f"{r['threat_rate'] * 100:.2f}%",
-                        'links': r['threat_stats']['links'],
-                        'keywords': r['threat_stats']['keywords'],
-                        'contacts': r['threat_stats']['contacts'],
-                        'avg_helpful': f"{r.get('avg_helpful', 0):.1f}",
-                        'chinese_reviews': r.get('language_stats', {}).get('chinese', 0),
-                        'english_reviews': r.get('language_stats', {}).get('english', 0)
-                    })
-            print(f"完成：评论分析结果已保存 -> {self.comment_analysis_csv.name}")
+            analysis_rows = []
+            for r in results:
+                analysis_rows.append({
+                    'appid': r['appid'],
+                    'title': r['title'],
+                    'total_reviews': r['total_reviews'],
+                    'suspicious_reviews': r['suspicious_reviews'],
+                    'threat_rate': f"{r['threat_rate'] * 100:.2f}%",
+                    'links': r['threat_stats']['links'],
+                    'keywords': r['threat_stats']['keywords'],
+                    'contacts': r['threat_stats']['contacts'],
+                    'avg_helpful': f"{r.get('avg_helpful', 0):.1f}",
+                    'chinese_reviews': r.get('language_stats', {}).get('chinese', 0),
+                    'english_reviews': r.get('language_stats', {}).get('english', 0),
+                    'threat_rate_ci_low': f"{r['threat_rate_ci'][0] * 100:.2f}%",
+                    'threat_rate_ci_high': f"{r['threat_rate_ci'][1] * 100:.2f}%"
+                })
 
             suspicious_details = []
             for r in results:
-                if 'details' in r and r['details']:
-                    for detail in r['details']:
-                        suspicious_details.append({
-                            'appid': r['appid'],
-                            'game_title': r['title'],
-                            'review_index': detail['index'],
-                            'review_content': detail['content'],
-                            'page': detail['page'],
-                            'helpful': detail['helpful'],
-                            'language': detail['language'],
-                            'has_links': '是' if detail['threats']['links'] > 0 else '否',
-                            'has_keywords': '是' if detail['threats']['keywords'] > 0 else '否',
-                            'has_contacts': '是' if detail['threats']['contacts'] > 0 else '否',
-                            'link_count': detail['threats']['links'],
-                            'keyword_count': detail['threats']['keywords'],
-                            'contact_count': detail['threats']['contacts']
-                        })
-            if suspicious_details:
-                with open(self.suspicious_reviews_csv, 'w', newline='', encoding='utf-8-sig') as f:
-                    fieldnames = ['appid', 'game_title', 'review_index', 'review_content', 'page',
-                                  'helpful', 'language', 'has_links', 'has_keywords', 'has_contacts',
-                                  'link_count', 'keyword_count', 'contact_count']
-                    writer = csv.DictWriter(f, fieldnames=fieldnames)
-                    writer.writeheader()
-                    writer.writerows(suspicious_details)
-                print(f"完成：可疑评论详情已保存 -> {self.suspicious_reviews_csv.name} (共 {len(suspicious_details)} 条)")
-        return results
+                for detail in r.get('details') or []:
+                    threats = detail.threats
+                    suspicious_details.append({
+                        'appid': r['appid'],
+                        'game_title': r['title'],
+                        'review_index': detail.index,
+                        'review_content': detail.content,
+                        'page': detail.page,
+                        'helpful': detail.helpful,
+                        'language': detail.language,
+                        'has_links': '是' if threats.links > 0 else '否',
+                        'has_keywords': '是' if threats.keywords > 0 else '否',
+                        'has_contacts': '是' if threats.contacts > 0 else '否',
+                        'link_count': threats.links,
+                        'keyword_count': threats.keywords,
+                        'contact_count': threats.contacts
+                    })
+            with self.open_sink() as sink:
+                sink.write("comment_analysis", analysis_rows)
+                print(f"完成：评论分析结果已保存 -> {sink.describe('comment_analysis')}")
+                if suspicious_details:
+                    sink.write("suspicious_reviews", suspicious_details)
+                    print(f"完成：可疑评论详情已保存 -> {sink.describe('suspicious_reviews')} "
+                          f"(共 {len(suspicious_details)} 条)")
 
-    def step4_visualize_analysis(self, show_plots=True):
+    def step4_visualize_analysis(self, show_plots=True, render_dir=None, render_formats=("png",)):
         print("\n--- 步骤 4/4：数据分析与可视化 ---")
-        if not show_plots:
+        if not show_plots and not render_dir:
             print("已跳过图表显示")
             return
         analysis_dir = BASE_DIR / "src" / "analysis part"
         if str(analysis_dir) not in sys.path:
             sys.path.insert(0, str(analysis_dir))
+        if render_dir:
+            try:
+                from chart_render import render_charts
+                rendered, cached = render_charts(str(self.cleaned_csv), str(render_dir),
+                                                 formats=render_formats)
+                print(f"完成：图表已输出 -> {render_dir} (新渲染 {len(rendered)} 张，缓存命中 {len(cached)} 张)")
+            except Exception as e:
+                print(f"渲染图表出错: {e}")
+                import traceback
+                traceback.print_exc()
+            return
         try:
             from data_analysis import run_analysis
             run_analysis(str(self.cleaned_csv))
@@ -195,29 +353,199 @@ class SteamAnalysisPipeline:
             import traceback
             traceback.print_exc()
 
-    def run_full_pipeline(self, pages=3, max_comment_games=15, max_reviews=50, show_plots=True):
+    def run_pipelined(self, pages=3, max_comment_games=15, max_reviews=50, show_plots=True,
+                      render_dir=None, render_formats=("png",), review_workers=2, queue_size=8,
+                      lists=("topsellers",)):
+        """步骤1与步骤3重叠执行：每补全并清洗一款游戏就放入有界队列，
+        评论分析线程立即开始处理。两个阶段访问不同主机
+        (store.steampowered.com / steamcommunity.com)，总耗时接近两者中的较大者"""
+        import queue
+        import threading
+        from steam_data_extractor import save_csv
+        from clean.data_cleaner import clean_row
+        from comments.simple_steam_crawler_easy import analyze_game_threats
+
+        if not self.load_threat_rules():
+            return False
+        print("--- 我超你SteamSpider（流水线模式） ---")
+        print(f"配置: 抓取页数={pages}, 评论分析游戏数={max_comment_games}, 每款评论数={max_reviews}, "
+              f"评论线程={review_workers}")
+        start_time = time.time()
+        review_queue = queue.Queue(maxsize=queue_size)
+        trends = self.open_trends()
+        results = {}
+        lock = threading.Lock()
+
+        def review_worker():
+            while True:
+                job = review_queue.get()
+                try:
+                    if job is None:
+                        return
+                    rank, game = job
+                    try:
+                        result = analyze_game_threats(game.appid, game.title, max_reviews, trends,
+                                                      self.review_sampling)
+                    except Exception as e:
+                        print(f"  评论分析出错 #{rank} {game.title}: {e}")
+                        result = None
+                    with lock:
+                        if result:
+                            results[rank] = result
+                            print(f"  评论完成 #{rank} {game.title}：{result['total_reviews']} 条评论，"
+                                  f"{result['suspicious_reviews']} 条可疑（{result['threat_rate'] * 100:.1f}%）")
+                        else:
+                            print(f"  评论完成 #{rank} {game.title}：无法获取评论")
+                    sleep(2, "reviews")
+                finally:
+                    review_queue.task_done()
+
+        workers = [threading.Thread(target=review_worker, daemon=True) for _ in range(review_workers)]
+        for w in workers:
+            w.start()
+
+        out = []
+        ranks = []
+        queued = set()
+
+        def stop_workers(aborted):
+            if aborted:
+                # 中断或出错时丢弃尚未开始的任务，只等正在处理的游戏结束
+                while True:
+                    try:
+                        review_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    review_queue.task_done()
+            for _ in workers:
+                review_queue.put(None)
+            for w in workers:
+                w.join()
+
+        def crawl_and_review():
+            aborted = True
+            try:
+                print("\n--- 抓取游戏数据，同时分析评论 ---")
+                all_items, list_ranks = self.fetch_search_items(pages, lists)
+                ranks.extend(list_ranks)
+                for i, it in enumerate(all_items, 1):
+                    print(f"[{i}/{len(all_items)}] {it.title[:50]} (appid={it.appid})")
+                    record = self.enrich_item(it)
+                    out.append(record)
+                    cleaned = clean_row(record)
+                    if cleaned and cleaned.appid not in queued and len(queued) < max_comment_games:
+                        queued.add(cleaned.appid)
+                        review_queue.put((len(queued), cleaned))
+                    sleep(1.0, "enrich")
+                aborted = False
+            finally:
+                stop_workers(aborted)
+
+        try:
+            self.run_step("1+3", crawl_and_review)
+            with self.open_sink() as sink:
+                save_csv(out, str(self.raw_csv), sink)
+                sink.write("list_ranks", ranks)
+                target = sink.describe("games")
+            self.record_prices(out)
+            self.games_data = out
+            print(f"完成：已保存 {len(out)} 条游戏数据 -> {target}")
+            self.run_step("2", self.step2_clean_data)
+
+            comment_results = [results[rank] for rank in sorted(results)]
+            if trends is not None:
+                trends.save()
+            self.save_comment_results(comment_results)
+            self.run_step("4", self.step4_visualize_analysis, show_plots=show_plots, render_dir=render_dir,
+                          render_formats=render_formats)
+            elapsed = time.time() - start_time
+            print("\n--- 执行完成 ---")
+            print(f"总耗时: {elapsed:.1f} 秒")
+            print(f"抓取到游戏: {len(out)} 条")
+            print(f"评论分析: {len(comment_results)} 款游戏")
+            return True
+        except KeyboardInterrupt:
+            print("用户中断执行")
+            return False
+        except Exception as e:
+            print(f"错误: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+    def run_full_pipeline(self, pages=3, max_comment_games=15, max_reviews=50, show_plots=True,
+                          render_dir=None, render_formats=("png",), use_cache=True,
+                          crawl_max_age=3600, lists=("topsellers",), reviews_max_age=6 * 3600):
         print("--- 我超你SteamSpider ---")
         print(f"配置: 抓取页数={pages}, 评论分析游戏数={max_comment_games}, 每款评论数={max_reviews}, 显示图表={show_plots}")
         start_time = time.time()
+        from step_cache import StepCache
+        from records import Game
+        cache = StepCache(self.step_cache_file)
+        if not use_cache:
+            cache.entries = {}
+        cached_steps = []
         try:
-            games = self.step1_extract_games(pages=pages)
-            self.step2_clean_data()
-            comment_results = self.step3_analyze_comments(
-                max_games=max_comment_games,
-                max_reviews_per_game=max_reviews
-            )
-            self.step4_visualize_analysis(show_plots=show_plots)
+            # 步骤1没有本地输入，只按参数和抓取时间（crawl_max_age 秒）判断是否复用
+            games, hit = self.run_cached_step(
+                cache, "1", lambda: self.step1_extract_games(pages=pages, lists=lists),
+                params={"pages": pages, "lists": list(lists)}, outputs=[self.raw_csv],
+                load_cached=lambda: self._read_rows(self.raw_csv, Game), max_age=crawl_max_age)
+            if hit:
+                self.games_data = games
+                cached_steps.append("1")
+            _, hit = self.run_cached_step(
+                cache, "2", self.step2_clean_data,
+                inputs=[self.raw_csv], outputs=[self.cleaned_csv])
+            if hit:
+                cached_steps.append("2")
+            # 只写 SQLite 时以数据库文件作为步骤3的输出
+            if self.storage == "sqlite":
+                comment_outputs, optional_comment_outputs = [self.db_file], []
+            else:
+                comment_outputs = [self.comment_analysis_csv]
+                optional_comment_outputs = [self.suspicious_reviews_csv]
+            comment_results, hit = self.run_cached_step(
+                cache, "3", lambda: self.step3_analyze_comments(
+                    max_games=max_comment_games,
+                    max_reviews_per_game=max_reviews
+                ),
+                inputs=[self.cleaned_csv, threat_rules.pack_file()],
+                params={"max_games": max_comment_games, "max_reviews": max_reviews,
+                        "storage": self.storage,
+                        "sampling": self.review_sampling.params() if self.review_sampling else None},
+                outputs=comment_outputs, optional_outputs=optional_comment_outputs,
+                # 评论来自网络，清洗结果不变时也要定期重新抓取
+                load_cached=self.load_comment_results, max_age=reviews_max_age)
+            if hit:
+                cached_steps.append("3")
+            if render_dir:
+                # 交互显示无法缓存，只有渲染到目录时才按输入跳过
+                _, hit = self.run_cached_step(
+                    cache, "4", lambda: self.step4_visualize_analysis(
+                        show_plots=show_plots, render_dir=render_dir, render_formats=render_formats),
+                    inputs=[self.cleaned_csv],
+                    params={"render_dir": str(render_dir), "render_formats": list(render_formats)},
+                    outputs=[Path(render_dir) / "render_cache.json"])
+                if hit:
+                    cached_steps.append("4")
+            else:
+                self.run_step("4", self.step4_visualize_analysis, show_plots=show_plots)
             elapsed = time.time() - start_time
             print("\n--- 执行完成 ---")
             print(f"总耗时: {elapsed:.1f} 秒")
+            print(f"缓存命中步骤: {', '.join(cached_steps) if cached_steps else '无'}")
             print(f"抓取到游戏: {len(games)} 条")
             print(f"评论分析: {len(comment_results)} 款游戏")
             print("生成文件:")
             print(f"  - {self.raw_csv}")
             print(f"  - {self.cleaned_csv}")
-            print(f"  - {self.comment_analysis_csv}")
-            if self.suspicious_reviews_csv.exists():
-                print(f"  - {self.suspicious_reviews_csv}")
+            if self.storage != "sqlite":
+                print(f"  - {self.comment_analysis_csv}")
+                if self.suspicious_reviews_csv.exists():
+                    print(f"  - {self.suspicious_reviews_csv}")
+            if self.storage != "csv":
+                print(f"  - {self.db_file}")
             print("--- 结束 ---")
             return True
         except KeyboardInterrupt:
@@ -234,28 +562,122 @@ def main():
     import argparse
     parser = argparse.ArgumentParser(description='Steam 数据分析流水线')
     parser.add_argument('--pages', type=int, default=3, help='抓取页数 (默认3)')
+    parser.add_argument('--lists', type=str, nargs='+', default=['topsellers'],
+                        help='要抓取的榜单：topsellers specials newreleases popularnew 或 tag:<标签id>，'
+                             '多个榜单并发抓取并按 appid 去重 (默认topsellers)')
     parser.add_argument('--games', type=int, default=15, help='评论分析游戏数 (默认15)')
     parser.add_argument('--reviews', type=int, default=50, help='每款游戏评论数 (默认50)')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='自适应评论采样：威胁率置信区间足够窄就停止翻页，可疑的游戏多采样')
+    parser.add_argument('--ci-width', type=float, default=0.1,
+                        help='自适应采样的目标置信区间宽度 (默认0.1，即±5%%)')
+    parser.add_argument('--adaptive-max', type=int, default=None,
+                        help='自适应采样每款游戏最多评论数 (默认 --reviews 的4倍)')
     parser.add_argument('--no-plots', action='store_true', help='不显示图表')
+    parser.add_argument('--render-dir', type=str, default=None,
+                        help='无界面模式：把各图表渲染为文件保存到该目录')
+    parser.add_argument('--render-format', type=str, nargs='+', choices=['png', 'svg'],
+                        default=['png'], help='渲染文件格式 (默认png)')
+    parser.add_argument('--no-cache', action='store_true', help='忽略步骤缓存，全部重新执行')
+    parser.add_argument('--crawl-max-age', type=int, default=3600,
+                        help='复用上次抓取结果的最长时间，单位秒 (默认3600)')
+    parser.add_argument('--reviews-max-age', type=int, default=6 * 3600,
+                        help='复用上次评论分析结果的最长时间，单位秒 (默认21600)')
+    parser.add_argument('--pipelined', action='store_true',
+                        help='流水线模式：抓取游戏的同时分析评论（仅 --step all）')
+    parser.add_argument('--review-workers', type=int, default=2, help='流水线模式下的评论分析线程数 (默认2)')
+    parser.add_argument('--profile', type=str, nargs='?', const=str(DATA_DIR / "profiles"), default=None,
+                        help='为每个步骤输出 cProfile 结果 (默认目录 data/profiles)')
+    parser.add_argument('--storage', type=str, choices=['csv', 'sqlite', 'both'], default='csv',
+                        help='输出存储：csv 整表重写，sqlite 按 appid upsert 到数据库，both 两者都写 (默认csv)')
+    parser.add_argument('--db', type=str, default=str(DATA_DIR / "steam.db"),
+                        help='SQLite 数据库路径 (默认 data/steam.db)')
+    parser.add_argument('--fetch-workers', type=int, default=1,
+                        help='步骤1补全游戏信息的下载线程数 (默认1)')
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help='页面解析子进程数，0 表示在下载线程内解析 (默认0)')
+    parser.add_argument('--hedge', type=float, nargs='?', const=0.05, default=None, metavar='BUDGET',
+                        help='对冲请求：超过接口 p95 延迟未返回时再发一份，BUDGET 为对冲占比上限 (默认0.05)')
+    parser.add_argument('--rules', type=str, default=threat_rules.DEFAULT_PACK_FILE,
+                        help='威胁规则包 (默认 data/threat_rules.json)，运行中修改会自动重新加载')
+    parser.add_argument('--no-archive', action='store_true', help='不把抓取到的原始页面写入归档')
+    parser.add_argument('--replay', action='store_true',
+                        help='回放模式：步骤1/3从页面归档读取而不访问网络，并行重新提取')
+    parser.add_argument('--replay-since', type=str, default=None,
+                        help='回放只用该时间之后的抓取，格式 YYYY-MM-DD[ HH:MM]')
+    parser.add_argument('--replay-until', type=str, default=None,
+                        help='回放只用该时间之前的抓取（不含），格式 YYYY-MM-DD[ HH:MM]；默认取每个页面最新的一次')
+    parser.add_argument('--replay-segment', type=str, nargs='+', default=None,
+                        help='回放只用指定的归档分段文件（python page_archive.py 列出各分段）')
+    parser.add_argument('--archive-dir', type=str, default=str(DATA_DIR / "archive"),
+                        help='页面归档目录 (默认 data/archive)')
     parser.add_argument('--step', type=str, choices=['1', '2', '3', '4', 'all'],
                         default='all', help='执行特定步骤 (1-4) 或全部 (all)')
     args = parser.parse_args()
     pipeline = SteamAnalysisPipeline()
-    if args.step == 'all':
+    pipeline.profile_dir = args.profile
+    pipeline.storage = args.storage
+    pipeline.fetch_workers = args.fetch_workers
+    if args.adaptive:
+        from comments.simple_steam_crawler_easy import AdaptiveSampling
+        pipeline.review_sampling = AdaptiveSampling(
+            min_reviews=min(20, args.reviews),
+            max_reviews=args.adaptive_max or args.reviews * 4,
+            target_width=args.ci_width
+        )
+    parse_workers = args.parse_workers
+    if args.replay:
+        # 回放不访问网络：去掉礼貌性等待，下载线程与解析进程按 CPU 数并行
+        import perf_metrics
+        perf_metrics.SLEEP_SCALE = 0.0
+        pipeline.fetch_workers = max(args.fetch_workers, 8)
+        parse_workers = parse_workers or os.cpu_count() or 1
+    parse_pool.configure(parse_workers)
+    threat_rules.configure(args.rules)
+    if args.hedge and not args.replay:
+        import perf_metrics
+        concurrency = pipeline.fetch_workers + (args.review_workers if args.pipelined else 0)
+        perf_metrics.configure_hedging(args.hedge, concurrency=concurrency)
+    if args.replay or not args.no_archive:
+        page_archive.configure(args.archive_dir, replay=args.replay,
+                               since=parse_time_arg(args.replay_since), until=parse_time_arg(args.replay_until),
+                               segments=args.replay_segment)
+    pipeline.db_file = Path(args.db)
+    if args.step == 'all' and args.pipelined:
+        pipeline.run_pipelined(
+            pages=args.pages,
+            max_comment_games=args.games,
+            max_reviews=args.reviews,
+            show_plots=not args.no_plots,
+            render_dir=args.render_dir,
+            render_formats=args.render_format,
+            review_workers=args.review_workers,
+            lists=args.lists
+        )
+    elif args.step == 'all':
         pipeline.run_full_pipeline(
             pages=args.pages,
             max_comment_games=args.games,
             max_reviews=args.reviews,
-            show_plots=not args.no_plots
+            show_plots=not args.no_plots,
+            render_dir=args.render_dir,
+            render_formats=args.render_format,
+            use_cache=not args.no_cache and not args.replay,
+            crawl_max_age=args.crawl_max_age,
+            lists=args.lists,
+            reviews_max_age=args.reviews_max_age
         )
     elif args.step == '1':
-        pipeline.step1_extract_games(args.pages)
+        pipeline.run_step('1', pipeline.step1_extract_games, args.pages, args.lists)
     elif args.step == '2':
-        pipeline.step2_clean_data()
+        pipeline.run_step('2', pipeline.step2_clean_data)
     elif args.step == '3':
-        pipeline.step3_analyze_comments(args.games, args.reviews)
+        pipeline.run_step('3', pipeline.step3_analyze_comments, args.games, args.reviews)
     elif args.step == '4':
-        pipeline.step4_visualize_analysis(not args.no_plots)
+        pipeline.run_step('4', pipeline.step4_visualize_analysis, not args.no_plots, args.render_dir,
+                          args.render_format)
+    parse_pool.shutdown()
+    pipeline.write_metrics()
 
 
 if __name__ == "__main__":
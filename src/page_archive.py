@@ -0,0 +1,208 @@
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+# 原始页面归档：每次成功抓取的搜索页、商店页、appdetails JSON 和评论页
+# 以类 WARC 记录追加写入 gzip 分段文件（每条记录一个 gzip 成员，可按偏移单独解压），
+# index.jsonl 记录 键/appid/URL -> 分段与偏移。解析逻辑变化后用 --replay 从归档重新提取，不访问网络。
+# 同一键的每次抓取都保留；回放时可按抓取时间范围或分段筛选，取范围内最新的一次。
+# 流式读取中途停止的页面只有前缀，存在单独的键下，不会顶替完整页面；
+# 只有声明能处理前缀的调用（商店页标签）回放时才会拿到前缀记录
+ARCHIVE_VERSION = 1
+INDEX_FILE = "index.jsonl"
+PREFIX_SUFFIX = " #prefix"
+
+_archive = None
+
+
+def configure(archive_dir, replay=False, since=None, until=None, segments=None):
+    global _archive
+    _archive = (PageArchive(archive_dir, replay=replay, since=since, until=until, segments=segments)
+                if archive_dir else None)
+    return _archive
+
+
+def current():
+    return _archive
+
+
+def request_key(endpoint, url, params=None):
+    """归档键：接口 + 路径 + 排序后的查询参数，不含主机名，便于跨环境回放"""
+    parts = urlsplit(url)
+    query = urlencode(sorted((params or {}).items()))
+    if parts.query:
+        query = parts.query + ("&" + query if query else "")
+    return f"{endpoint} {parts.path}?{query}"
+
+
+def appid_of(url, params=None):
+    if params and params.get("appids"):
+        return str(params["appids"])
+    m = re.search(r"/app/(\d+)", url)
+    return m.group(1) if m else ""
+
+
+class ArchivedResponse:
+    """从归档读出的响应，提供抓取代码用到的 requests.Response 属性"""
+
+    def __init__(self, url, status_code, content, encoding="utf-8", truncated=False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding
+        # 归档里只有页面前缀
+        self.truncated = truncated
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.text)
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.HTTPError(f"{self.status_code} (archive) for url: {self.url}", response=self)
+
+
+class PageArchive:
+    """since/until 为时间戳，segments 为分段文件名集合，只影响回放时选用哪些记录"""
+
+    def __init__(self, archive_dir, replay=False, since=None, until=None, segments=None):
+        self.archive_dir = str(archive_dir)
+        self.replay = replay
+        self.since = since
+        self.until = until
+        self.segments = set(segments) if segments else None
+        self.index_file = os.path.join(self.archive_dir, INDEX_FILE)
+        self.segment = f"pages-{time.strftime('%Y%m%d')}-{os.getpid()}.warc.gz"
+        # 键 -> 按抓取顺序排列的全部记录
+        self.entries = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.archive_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 进程中断时最后一行可能不完整
+                        continue
+                    key = entry["key"]
+                    # 早期版本把前缀与完整页面记在同一个键下
+                    if entry.get("truncated") and not key.endswith(PREFIX_SUFFIX):
+                        key += PREFIX_SUFFIX
+                    self.entries.setdefault(key, []).append(entry)
+        except FileNotFoundError:
+            pass
+
+    def record(self, endpoint, url, params, response, body=None, truncated=False):
+        """body 为流式读取到的内容（为 None 时取 response.content）；
+        truncated 表示读取中途停止、body 只是前缀，这类记录存在单独的键下"""
+        if response.status_code != 200:
+            return
+        key = request_key(endpoint, url, params)
+        if body is None:
+            body = response.content
+        target = key.split(' ', 1)[1]
+        if truncated:
+            key += PREFIX_SUFFIX
+        header = (f"WARC/1.0\r\nWARC-Type: response\r\nWARC-Target-URI: {target}\r\n"
+                  f"WARC-Date: {time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}\r\n"
+                  f"X-Endpoint: {endpoint}\r\nX-Status: {response.status_code}\r\n"
+                  f"X-Encoding: {response.encoding or 'utf-8'}\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode("utf-8")
+        blob = gzip.compress(header + body + b"\r\n\r\n")
+        with self._lock:
+            path = os.path.join(self.archive_dir, self.segment)
+            with open(path, "ab") as f:
+                offset = f.tell()
+                f.write(blob)
+            entry = {"v": ARCHIVE_VERSION, "key": key, "endpoint": endpoint, "appid": appid_of(url, params),
+                     "url": url, "segment": self.segment, "offset": offset, "length": len(blob),
+                     "status": response.status_code, "encoding": response.encoding or "utf-8",
+                     "truncated": truncated, "time": time.time()}
+            with open(self.index_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.entries.setdefault(key, []).append(entry)
+
+    def selected(self, entry):
+        if self.since is not None and entry["time"] < self.since:
+            return False
+        if self.until is not None and entry["time"] >= self.until:
+            return False
+        return self.segments is None or entry["segment"] in self.segments
+
+    def select(self, key, prefix_ok=False):
+        """键在筛选范围内最新的一次抓取；prefix_ok 时前缀记录也参与比较"""
+        candidates = [e for e in self.entries.get(key, ()) if self.selected(e)]
+        if prefix_ok:
+            candidates += [e for e in self.entries.get(key + PREFIX_SUFFIX, ()) if self.selected(e)]
+        return max(candidates, key=lambda e: e["time"]) if candidates else None
+
+    def read(self, entry):
+        with open(os.path.join(self.archive_dir, entry["segment"]), "rb") as f:
+            f.seek(entry["offset"])
+            raw = gzip.decompress(f.read(entry["length"]))
+        _, body = raw.split(b"\r\n\r\n", 1)
+        return body[:-4]
+
+    def lookup(self, endpoint, url, params=None, prefix_ok=False):
+        """返回归档的响应；没有记录时返回 404，抓取代码按页面不存在处理。
+        只归档了前缀的页面，prefix_ok 为 False 时同样按 404 处理"""
+        entry = self.select(request_key(endpoint, url, params), prefix_ok)
+        if entry is None:
+            return ArchivedResponse(url, 404, b"")
+        return ArchivedResponse(url, entry["status"], self.read(entry), entry.get("encoding", "utf-8"),
+                                truncated=entry.get("truncated", False))
+
+    def appids(self, endpoint=None):
+        return sorted({e["appid"] for versions in self.entries.values() for e in versions
+                       if e["appid"] and (endpoint is None or e["endpoint"] == endpoint) and self.selected(e)})
+
+    def crawls(self):
+        """按分段汇总：[(分段, 记录数, 最早时间, 最晚时间)]，用来挑选回放范围"""
+        summary = {}
+        for versions in self.entries.values():
+            for e in versions:
+                s = summary.setdefault(e["segment"], [0, e["time"], e["time"]])
+                s[0] += 1
+                s[1] = min(s[1], e["time"])
+                s[2] = max(s[2], e["time"])
+        return sorted(((seg, n, first, last) for seg, (n, first, last) in summary.items()),
+                      key=lambda s: s[2])
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='列出页面归档中的各次抓取')
+    parser.add_argument('--dir', type=str,
+                        default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                             "data", "archive"),
+                        help='归档目录 (默认 data/archive)')
+    args = parser.parse_args()
+    crawls = PageArchive(args.dir, replay=True).crawls()
+    if not crawls:
+        print("归档为空")
+    fmt = lambda ts: time.strftime("%Y-%m-%d %H:%M", time.localtime(ts))
+    for segment, n, first, last in crawls:
+        print(f"{segment}  {n} 条  {fmt(first)} ~ {fmt(last)}")
+
+
+if __name__ == "__main__":
+    main()
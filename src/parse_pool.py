@@ -0,0 +1,70 @@
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from perf_metrics import METRICS
+
+# 抓取/解析分离：下载线程只取回原始页面，BeautifulSoup 解析交给子进程池，
+# 子进程只返回紧凑记录（SearchItem 列表、标签字符串、Review 列表），
+# 多核机器上解析不再受 GIL 限制。workers 为 0 时在调用线程内解析（默认）
+_workers = 0
+_pool = None
+_lock = threading.Lock()
+_parsers = None
+
+
+def _get_parser(kind):
+    global _parsers
+    if _parsers is None:
+        from steam_data_extractor import _parse_search_html
+        from comments.simple_steam_crawler_easy import parse_review_page
+        _parsers = {
+            "search": _parse_search_html,
+            "reviews": parse_review_page,
+        }
+    return _parsers[kind]
+
+
+def _run(kind, payload, args):
+    start = time.perf_counter()
+    result = _get_parser(kind)(payload, *args)
+    return result, time.perf_counter() - start
+
+
+def configure(workers):
+    """设置解析进程数；改变时关闭旧进程池，下次解析时按需创建"""
+    global _workers
+    with _lock:
+        if workers != _workers:
+            _shutdown_locked()
+        _workers = max(0, int(workers or 0))
+
+
+def shutdown():
+    with _lock:
+        _shutdown_locked()
+
+
+def _shutdown_locked():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=_workers)
+        return _pool
+
+
+def parse(kind, payload, *args):
+    """解析一页，kind 为 search / reviews；解析耗时按子进程内实际时间计入指标"""
+    if _workers <= 0:
+        result, seconds = _run(kind, payload, args)
+    else:
+        result, seconds = _get_pool().submit(_run, kind, payload, args).result()
+    METRICS.record_parse(kind, seconds)
+    return result
@@ -0,0 +1,439 @@
+import codecs
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import page_archive
+
+# 性能埋点：按接口记录请求耗时直方图、字节数、状态码、重试次数和解析耗时，
+# 按步骤记录墙钟/CPU 时间，可导出为 JSON 与 Prometheus 文本格式
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20]
+# 礼貌性等待的缩放系数；离线基准对本地桩服务器运行时设为 0
+SLEEP_SCALE = 1.0
+# 遇到限流/暂时不可用时的重试次数
+MAX_RETRIES = 3
+RETRY_STATUS = (429, 503)
+
+
+class Histogram:
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def to_dict(self):
+        return {"buckets": self.buckets, "counts": self.counts, "count": self.count,
+                "sum": self.sum, "max": self.max}
+
+
+class EndpointStats:
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.parse = Histogram()
+        self.bytes = 0
+        self.status = {}
+        self.errors = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def to_dict(self):
+        return {"latency": self.latency.to_dict(), "parse": self.parse.to_dict(),
+                "bytes": self.bytes, "status": self.status, "errors": self.errors,
+                "retries": self.retries, "hedges": self.hedges, "hedge_wins": self.hedge_wins}
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.endpoints = {}
+        self.steps = {}
+        self.sleeps = {}
+        self.rules = None
+
+    def endpoint(self, name):
+        stats = self.endpoints.get(name)
+        if stats is None:
+            stats = self.endpoints[name] = EndpointStats()
+        return stats
+
+    def record_request(self, name, seconds, status=None, nbytes=0, error=False):
+        with self.lock:
+            stats = self.endpoint(name)
+            stats.latency.observe(seconds)
+            stats.bytes += nbytes
+            if status is not None:
+                stats.status[str(status)] = stats.status.get(str(status), 0) + 1
+            if error:
+                stats.errors += 1
+
+    def record_retry(self, name):
+        with self.lock:
+            self.endpoint(name).retries += 1
+
+    def record_hedge(self, name, won):
+        with self.lock:
+            stats = self.endpoint(name)
+            stats.hedges += 1
+            stats.hedge_wins += 1 if won else 0
+
+    def record_parse(self, name, seconds):
+        with self.lock:
+            self.endpoint(name).parse.observe(seconds)
+
+    def record_sleep(self, label, seconds):
+        with self.lock:
+            entry = self.sleeps.setdefault(label, {"count": 0, "seconds": 0.0})
+            entry["count"] += 1
+            entry["seconds"] += seconds
+
+    def record_rules(self, stats):
+        """威胁规则包的逐条命中/耗时快照（threat_rules.ThreatRules.stats()）"""
+        with self.lock:
+            self.rules = stats
+
+    def record_step(self, step, wall, cpu):
+        with self.lock:
+            entry = self.steps.setdefault(step, {"runs": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0})
+            entry["runs"] += 1
+            entry["wall_seconds"] += wall
+            entry["cpu_seconds"] += cpu
+
+    def to_dict(self):
+        with self.lock:
+            data = {"endpoints": {k: v.to_dict() for k, v in self.endpoints.items()},
+                    "steps": dict(self.steps), "sleeps": dict(self.sleeps)}
+            if self.rules:
+                data["threat_rules"] = self.rules
+            return data
+
+    def write_json(self, path):
+        os.makedirs(os.path.dirname(str(path)) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        data = self.to_dict()
+        lines = []
+
+        def histogram(metric, help_text, per_endpoint_key):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            for name, stats in data["endpoints"].items():
+                h = stats[per_endpoint_key]
+                cumulative = 0
+                for bound, count in zip(h["buckets"], h["counts"]):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{endpoint="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{endpoint="{name}",le="+Inf"}} {h["count"]}')
+                lines.append(f'{metric}_sum{{endpoint="{name}"}} {h["sum"]}')
+                lines.append(f'{metric}_count{{endpoint="{name}"}} {h["count"]}')
+
+        histogram("steam_spider_request_seconds", "HTTP request latency per endpoint", "latency")
+        histogram("steam_spider_parse_seconds", "Response parse time per endpoint", "parse")
+
+        lines.append("# HELP steam_spider_response_bytes_total Response bytes per endpoint")
+        lines.append("# TYPE steam_spider_response_bytes_total counter")
+        for name, stats in data["endpoints"].items():
+            lines.append(f'steam_spider_response_bytes_total{{endpoint="{name}"}} {stats["bytes"]}')
+        lines.append("# HELP steam_spider_responses_total Responses per endpoint and status code")
+        lines.append("# TYPE steam_spider_responses_total counter")
+        for name, stats in data["endpoints"].items():
+            for status, count in stats["status"].items():
+                lines.append(f'steam_spider_responses_total{{endpoint="{name}",status="{status}"}} {count}')
+        for metric, key, help_text in [("steam_spider_request_errors_total", "errors", "Failed requests per endpoint"),
+                                       ("steam_spider_request_retries_total", "retries", "Retried requests per endpoint"),
+                                       ("steam_spider_hedged_requests_total", "hedges", "Hedge requests sent per endpoint"),
+                                       ("steam_spider_hedge_wins_total", "hedge_wins", "Hedge requests that answered first")]:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for name, stats in data["endpoints"].items():
+                lines.append(f'{metric}{{endpoint="{name}"}} {stats[key]}')
+
+        for metric, key, help_text in [("steam_spider_step_wall_seconds", "wall_seconds", "Wall time per pipeline step"),
+                                       ("steam_spider_step_cpu_seconds", "cpu_seconds", "CPU time per pipeline step")]:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} gauge")
+            for step, entry in data["steps"].items():
+                lines.append(f'{metric}{{step="{step}"}} {entry[key]}')
+        lines.append("# HELP steam_spider_sleep_seconds_total Time spent in politeness sleeps")
+        lines.append("# TYPE steam_spider_sleep_seconds_total counter")
+        for label, entry in data["sleeps"].items():
+            lines.append(f'steam_spider_sleep_seconds_total{{reason="{label}"}} {entry["seconds"]}')
+        rules = data.get("threat_rules")
+        if rules:
+            for metric, key, help_text in [("steam_spider_rule_hits_total", "hits", "Matches per threat rule"),
+                                           ("steam_spider_rule_match_seconds_total", "seconds",
+                                            "Time spent matching per threat rule")]:
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for rule in rules["rules"]:
+                    lines.append(f'{metric}{{pack="{rules["pack"]}",rule="{rule["id"]}"}} {rule[key]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        os.makedirs(os.path.dirname(str(path)) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+
+
+METRICS = MetricsRegistry()
+
+
+class HedgePolicy:
+    """对冲请求：GET 超过该接口近期 p95 延迟仍未返回时再发一份，先返回的胜出。
+    对冲次数不超过总请求数的 budget 比例；样本不足 min_samples 时不对冲。
+    每次尝试都以 stream=True 发出，胜出的一方再读取响应体；requests 无法打断已发出、
+    还没收到响应头的请求，落败的一方在收到响应头后立即关闭连接，不下载响应体，
+    并按一次请求计入指标（状态码，字节数为 0）。
+    线程池按并发抓取线程数的 2 倍配置，延迟样本只计请求实际执行的时间，不含排队"""
+
+    def __init__(self, budget=0.05, min_samples=20, window=200, concurrency=8):
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+        self.budget = budget
+        self.min_samples = min_samples
+        self.latencies = {}
+        self.requests = 0
+        self.hedges = 0
+        self.lock = threading.Lock()
+        self._deque = lambda: deque(maxlen=window)
+        self.executor = ThreadPoolExecutor(max_workers=max(2, 2 * concurrency), thread_name_prefix="hedge")
+
+    def observe(self, endpoint, seconds):
+        with self.lock:
+            self.latencies.setdefault(endpoint, self._deque()).append(seconds)
+
+    def delay(self, endpoint):
+        with self.lock:
+            samples = self.latencies.get(endpoint)
+            if not samples or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def take(self):
+        """占用一次对冲额度"""
+        with self.lock:
+            if self.hedges + 1 > self.budget * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    @staticmethod
+    def _attempt(fn):
+        start = time.perf_counter()
+        try:
+            return fn(), None, time.perf_counter() - start
+        except Exception as e:
+            return None, e, time.perf_counter() - start
+
+    def call(self, endpoint, fn, read_body=True):
+        """执行 fn()（以 stream=True 发出一次 GET），必要时对冲；read_body 时返回前读完胜出者的响应体"""
+        from concurrent.futures import wait
+        with self.lock:
+            self.requests += 1
+        delay = self.delay(endpoint)
+        if delay is None:
+            response, error, seconds = self._attempt(fn)
+        else:
+            primary = self.executor.submit(self._attempt, fn)
+            done, _ = wait([primary], timeout=delay)
+            if done or not self.take():
+                response, error, seconds = primary.result()
+            else:
+                response, error, seconds = self._race(endpoint, primary, self.executor.submit(self._attempt, fn))
+        if error is not None:
+            raise error
+        self.observe(endpoint, seconds)
+        if read_body:
+            response.content
+        return response
+
+    def _race(self, endpoint, primary, hedge):
+        """两次尝试中先成功的胜出，另一方交给 _discard；都失败时返回先失败的结果"""
+        from concurrent.futures import FIRST_COMPLETED, wait
+        pending = {primary, hedge}
+        failed = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result[1] is not None:
+                    if failed is None:
+                        failed = result
+                    else:
+                        # 两次都失败：调用方按一次失败计入，另一次在这里计入
+                        METRICS.record_request(endpoint, result[2], error=True)
+                    continue
+                if failed is not None:
+                    METRICS.record_request(endpoint, failed[2], error=True)
+                for loser in pending:
+                    loser.add_done_callback(lambda f: _discard(endpoint, f.result()))
+                METRICS.record_hedge(endpoint, won=future is hedge)
+                return result
+        METRICS.record_hedge(endpoint, won=False)
+        return failed
+
+
+def _discard(endpoint, result):
+    """落败的一次尝试：计入请求数，不读响应体直接关闭连接"""
+    response, error, seconds = result
+    if error is not None:
+        METRICS.record_request(endpoint, seconds, error=True)
+        return
+    METRICS.record_request(endpoint, seconds, status=response.status_code, nbytes=0,
+                           error=response.status_code >= 400)
+    try:
+        response.close()
+    except Exception:
+        pass
+
+
+HEDGING = None
+
+
+def configure_hedging(budget=None, concurrency=8, **kwargs):
+    """budget 为对冲请求占总请求的比例上限（如 0.05）；None 关闭对冲。
+    concurrency 为同时发请求的抓取线程数，用来确定对冲线程池大小"""
+    global HEDGING
+    if HEDGING is not None:
+        HEDGING.executor.shutdown(wait=False)
+    HEDGING = HedgePolicy(budget, concurrency=concurrency, **kwargs) if budget else None
+    return HEDGING
+
+
+def _send(endpoint, getter, url, kwargs):
+    if HEDGING is None:
+        return getter(url, **kwargs)
+    stream = kwargs.get("stream", False)
+    return HEDGING.call(endpoint, lambda: getter(url, **dict(kwargs, stream=True)), read_body=not stream)
+
+
+def timed_get(endpoint, url, session=None, **kwargs):
+    """requests.get 的包装，记录耗时、字节数和状态码；异常照常抛出。
+    配置了页面归档时，成功的响应写入归档；回放模式下直接从归档读取，不访问网络"""
+    archive = page_archive.current()
+    start = time.perf_counter()
+    if archive is not None and archive.replay:
+        r = archive.lookup(endpoint, url, kwargs.get("params"))
+        METRICS.record_request(endpoint, time.perf_counter() - start, status=r.status_code,
+                               nbytes=len(r.content), error=r.status_code >= 400)
+        return r
+    import requests
+    getter = session.get if session is not None else requests.get
+    try:
+        r = _send(endpoint, getter, url, kwargs)
+    except Exception:
+        METRICS.record_request(endpoint, time.perf_counter() - start, error=True)
+        raise
+    METRICS.record_request(endpoint, time.perf_counter() - start, status=r.status_code,
+                           nbytes=len(r.content), error=r.status_code >= 400)
+    if archive is not None:
+        archive.record(endpoint, url, kwargs.get("params"), r)
+    return r
+
+
+def retry_get(endpoint, url, session=None, **kwargs):
+    """timed_get 加上限流重试：429/503 时有 Retry-After 按服务器要求等待，否则指数退避，
+    最多重试 MAX_RETRIES 次，返回最后一次响应（调用方自行检查状态码）"""
+    r = timed_get(endpoint, url, session=session, **kwargs)
+    for attempt in range(MAX_RETRIES):
+        if r.status_code not in RETRY_STATUS:
+            break
+        retry_after = getattr(r, "headers", {}).get("Retry-After", "")
+        sleep(float(retry_after) if retry_after.isdigit() else 2.0 * 2 ** attempt, "retry")
+        METRICS.record_retry(endpoint)
+        r = timed_get(endpoint, url, session=session, **kwargs)
+    return r
+
+
+def timed_stream(endpoint, url, consume, session=None, chunk_size=16384, **kwargs):
+    """流式 GET：响应体按响应编码增量解码后逐块交给 consume(text)，返回 True 时停止读取并关闭连接。
+    字节数按实际读取量记录；中途停止时归档只保存读到的前缀（单独的键，不顶替完整页面），
+    回放时同样逐块读取，完整页面和前缀中取最新的一次"""
+    archive = page_archive.current()
+    start = time.perf_counter()
+    if archive is not None and archive.replay:
+        r = archive.lookup(endpoint, url, kwargs.get("params"), prefix_ok=True)
+    else:
+        import requests
+        getter = session.get if session is not None else requests.get
+        try:
+            r = _send(endpoint, getter, url, dict(kwargs, stream=True))
+        except Exception:
+            METRICS.record_request(endpoint, time.perf_counter() - start, error=True)
+            raise
+    chunks = []
+    stopped = False
+    try:
+        if r.status_code == 200:
+            decoder = codecs.getincrementaldecoder(r.encoding or "utf-8")(errors="replace")
+            for chunk in r.iter_content(chunk_size):
+                chunks.append(chunk)
+                if consume(decoder.decode(chunk)):
+                    stopped = True
+                    break
+    finally:
+        r.close()
+        body = b"".join(chunks)
+        METRICS.record_request(endpoint, time.perf_counter() - start, status=r.status_code,
+                               nbytes=len(body), error=r.status_code >= 400)
+    if archive is not None and not archive.replay:
+        # 读完了整个响应体时按完整页面归档
+        archive.record(endpoint, url, kwargs.get("params"), r, body, truncated=stopped)
+    return r
+
+
+@contextmanager
+def parse_timer(endpoint):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        METRICS.record_parse(endpoint, time.perf_counter() - start)
+
+
+def sleep(seconds, label="delay"):
+    seconds = seconds * SLEEP_SCALE
+    METRICS.record_sleep(label, seconds)
+    if seconds > 0:
+        time.sleep(seconds)
+
+
+@contextmanager
+def step_timer(step, profile_dir=None):
+    """记录步骤墙钟与 CPU 时间；给定 profile_dir 时同时输出 cProfile 结果"""
+    profiler = cProfile.Profile() if profile_dir else None
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            os.makedirs(profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(profile_dir, f"step{step}.prof"))
+        METRICS.record_step(step, time.perf_counter() - wall_start, time.process_time() - cpu_start)
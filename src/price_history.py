@@ -0,0 +1,255 @@
+import json
+import os
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+# 价格历史：按 (appid, cc) 只记录价格变化（游程编码），价格不变的抓取只更新 last_seen。
+# changes.log 为追加写入的文本日志，每行 "appid cc 距该键上次变化的秒数 现价(分) 原价(分)"；
+# 每个键最后一次被抓到的时间先追加到 seen.log（每次抓取一行 "时间 cc appid appid ..."），
+# 行数超过 COMPACT_LINES 时才合并进 state.json 并清空日志，抓取少量游戏时不必重写全部键。
+# 加载时在内存中为每个键建立按时间排序的数组，
+# 另建全局变化时间索引，按时间点查价格、折扣窗口、某时刻后降价的游戏都是二分查找
+HISTORY_VERSION = 1
+CHANGES_FILE = "changes.log"
+STATE_FILE = "state.json"
+SEEN_FILE = "seen.log"
+COMPACT_LINES = 64
+DEFAULT_CC = "US"
+
+
+def parse_time_arg(text):
+    """YYYY-MM-DD[ HH:MM]（本地时间）转为时间戳，None 原样返回；格式错误时退出"""
+    if text is None:
+        return None
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return time.mktime(time.strptime(text, fmt))
+        except ValueError:
+            pass
+    print(f"错误：无法解析时间 {text}")
+    sys.exit(1)
+
+
+def to_cents(value):
+    try:
+        s = str(value).strip()
+        return int(round(float(s) * 100)) if s else None
+    except (TypeError, ValueError):
+        return None
+
+
+class PriceSeries:
+    """单个 (appid, cc) 的价格游程：starts[i] 起生效的现价/原价，直到下一次变化"""
+    __slots__ = ("starts", "current", "original", "last_seen")
+
+    def __init__(self):
+        self.starts = array("q")
+        self.current = array("i")
+        self.original = array("i")
+        self.last_seen = 0
+
+    def append(self, ts, current, original):
+        self.starts.append(ts)
+        self.current.append(current)
+        self.original.append(original)
+
+    def run_end(self, i):
+        return self.starts[i + 1] if i + 1 < len(self.starts) else self.last_seen
+
+    def index_at(self, ts):
+        i = bisect_right(self.starts, ts) - 1
+        if i < 0 or (i == len(self.starts) - 1 and ts > self.last_seen):
+            return None
+        return i
+
+
+class PriceHistory:
+
+    def __init__(self, history_dir):
+        self.history_dir = str(history_dir)
+        self.changes_file = os.path.join(self.history_dir, CHANGES_FILE)
+        self.state_file = os.path.join(self.history_dir, STATE_FILE)
+        self.seen_file = os.path.join(self.history_dir, SEEN_FILE)
+        self.seen_lines = 0
+        self.series = {}
+        # 全局时间索引：变化时间与对应键，按时间排序
+        self.change_times = array("q")
+        self.change_keys = []
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            last_seen = state.get("last_seen", {}) if state.get("version") == HISTORY_VERSION else {}
+        except (FileNotFoundError, ValueError):
+            last_seen = {}
+        try:
+            with open(self.seen_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) < 2 or not line.endswith("\n"):
+                        continue
+                    self.seen_lines += 1
+                    ts, cc = int(parts[0]), parts[1]
+                    for appid in parts[2:]:
+                        name = f"{appid}|{cc}"
+                        last_seen[name] = max(last_seen.get(name, 0), ts)
+        except FileNotFoundError:
+            pass
+        events = []
+        try:
+            with open(self.changes_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) != 5:
+                        # 进程中断时最后一行可能不完整
+                        continue
+                    appid, cc, dt, current, original = parts
+                    key = (appid, cc)
+                    series = self.series.get(key)
+                    if series is None:
+                        series = self.series[key] = PriceSeries()
+                    ts = (series.starts[-1] if len(series.starts) else 0) + int(dt)
+                    series.append(ts, int(current), int(original))
+                    events.append((ts, key))
+        except FileNotFoundError:
+            pass
+        for key, series in self.series.items():
+            series.last_seen = max(last_seen.get(f"{key[0]}|{key[1]}", 0), series.starts[-1])
+        events.sort()
+        self.change_times = array("q", (ts for ts, _ in events))
+        self.change_keys = [key for _, key in events]
+
+    def record(self, games, cc=DEFAULT_CC, ts=None):
+        """记录一次抓取的价格快照，返回发生变化的键数；价格无法解析的记录跳过"""
+        ts = int(ts if ts is not None else time.time())
+        lines = []
+        seen = []
+        for game in games:
+            appid = str(game.get("appid", "")).strip()
+            current = to_cents(game.get("current_price"))
+            if not appid or current is None:
+                continue
+            original = to_cents(game.get("original_price"))
+            if original is None:
+                original = current
+            key = (appid, cc)
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = PriceSeries()
+            if not len(series.starts) or series.current[-1] != current or series.original[-1] != original:
+                prev = series.starts[-1] if len(series.starts) else 0
+                lines.append(f"{appid} {cc} {ts - prev} {current} {original}\n")
+                series.append(ts, current, original)
+                i = bisect_right(self.change_times, ts)
+                self.change_times.insert(i, ts)
+                self.change_keys.insert(i, key)
+            series.last_seen = max(series.last_seen, ts)
+            seen.append(appid)
+        os.makedirs(self.history_dir, exist_ok=True)
+        if lines:
+            with open(self.changes_file, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+        if seen:
+            with open(self.seen_file, "a", encoding="utf-8") as f:
+                f.write(f"{ts} {cc} {' '.join(seen)}\n")
+            self.seen_lines += 1
+            if self.seen_lines > COMPACT_LINES:
+                self._compact_state()
+        return len(lines)
+
+    def _compact_state(self):
+        """把 seen.log 合并进 state.json；先替换 state.json 再清空日志，中途中断时日志重放结果不变"""
+        state = {"version": HISTORY_VERSION,
+                 "last_seen": {f"{a}|{c}": s.last_seen for (a, c), s in self.series.items()}}
+        tmp = self.state_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_file)
+        open(self.seen_file, "w", encoding="utf-8").close()
+        self.seen_lines = 0
+
+    def price_at(self, appid, ts, cc=DEFAULT_CC):
+        """返回 (现价, 原价)；该时刻没有观测时返回 None"""
+        series = self.series.get((str(appid), cc))
+        if series is None:
+            return None
+        i = series.index_at(int(ts))
+        if i is None:
+            return None
+        return series.current[i] / 100, series.original[i] / 100
+
+    def discount_windows(self, appid, cc=DEFAULT_CC):
+        """现价低于原价的连续区间：[(开始, 结束, 现价, 原价, 折扣率%)]"""
+        series = self.series.get((str(appid), cc))
+        if series is None:
+            return []
+        windows = []
+        for i in range(len(series.starts)):
+            current, original = series.current[i], series.original[i]
+            if original > 0 and current < original:
+                windows.append((series.starts[i], series.run_end(i), current / 100, original / 100,
+                                (original - current) / original * 100))
+        return windows
+
+    def dropped_since(self, since):
+        """since 之后现价下降的游戏：[(appid, cc, 时间, 原现价, 新现价)]"""
+        out = []
+        for j in range(bisect_left(self.change_times, int(since)), len(self.change_times)):
+            ts, key = self.change_times[j], self.change_keys[j]
+            series = self.series[key]
+            i = bisect_left(series.starts, ts)
+            if i > 0 and series.current[i] < series.current[i - 1]:
+                out.append((key[0], key[1], ts, series.current[i - 1] / 100, series.current[i] / 100))
+        return out
+
+
+def _fmt(ts):
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(ts))
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='查询价格历史')
+    parser.add_argument('--dir', type=str,
+                        default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                             "data", "price_history"),
+                        help='价格历史目录 (默认 data/price_history)')
+    parser.add_argument('--cc', type=str, default=DEFAULT_CC, help='地区代码 (默认US)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    at_cmd = sub.add_parser('at', help='某一时刻的价格')
+    at_cmd.add_argument('appid')
+    at_cmd.add_argument('when', help='时间，格式 YYYY-MM-DD[ HH:MM]')
+    windows_cmd = sub.add_parser('windows', help='某款游戏的所有折扣区间')
+    windows_cmd.add_argument('appid')
+    dropped_cmd = sub.add_parser('dropped', help='降价的游戏（默认今天0点以来）')
+    dropped_cmd.add_argument('--since', type=str, default=None, help='起始时间，格式 YYYY-MM-DD[ HH:MM]')
+    args = parser.parse_args()
+
+    history = PriceHistory(args.dir)
+    if args.command == 'at':
+        price = history.price_at(args.appid, parse_time_arg(args.when), args.cc)
+        if price is None:
+            print("该时刻没有价格记录")
+        else:
+            print(f"现价 {price[0]:.2f}，原价 {price[1]:.2f}")
+    elif args.command == 'windows':
+        windows = history.discount_windows(args.appid, args.cc)
+        if not windows:
+            print("没有折扣记录")
+        for start, end, current, original, rate in windows:
+            print(f"{_fmt(start)} ~ {_fmt(end)}  {original:.2f} -> {current:.2f}  (-{rate:.0f}%)")
+    else:
+        since = parse_time_arg(args.since or time.strftime("%Y-%m-%d"))
+        dropped = history.dropped_since(since)
+        if not dropped:
+            print("没有降价的游戏")
+        for appid, cc, ts, old, new in dropped:
+            print(f"{appid} [{cc}] {_fmt(ts)}  {old:.2f} -> {new:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+抓取、清洗、评论分析各阶段共用的紧凑记录类型
+
+大规模抓取时 games_data 和评论结果会长时间驻留内存。记录改用 __slots__，
+每条不再携带 __dict__ 和重复的字符串键；评论按列存放在 ReviewBatch 中。
+记录保留 get/keys/items/[] 接口，csv.DictWriter、csv_manifest、aggregate_cube
+可以直接消费，只在写 CSV 时才转成一行文本。
+"""
+
+from array import array
+from dataclasses import dataclass, fields
+from datetime import date
+
+LANGUAGES = ("unknown", "chinese", "english", "other")
+_LANGUAGE_CODES = {name: i for i, name in enumerate(LANGUAGES)}
+
+
+class RecordMixin:
+    """按字段名只读访问，兼容原来以字典传递记录的代码"""
+    __slots__ = ()
+
+    @classmethod
+    def field_names(cls):
+        return [f.name for f in fields(cls)]
+
+    @classmethod
+    def from_row(cls, row):
+        """由 csv.DictReader 的一行构造，缺失的列取默认值"""
+        return cls(**{name: row[name] for name in cls.field_names() if name in row})
+
+    def keys(self):
+        return self.field_names()
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in self.field_names()]
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __contains__(self, name):
+        return name in self.field_names()
+
+    def to_row(self):
+        return dict(self.items())
+
+
+@dataclass(slots=True)
+class SearchItem(RecordMixin):
+    """搜索结果页的一行"""
+    appid: str = ""
+    title: str = ""
+    released: str = ""
+    price_text: str = ""
+    tags_text: str = ""
+
+
+@dataclass(slots=True)
+class Game(RecordMixin):
+    """一款游戏；抓取阶段价格为字符串，清洗后为 float。字段顺序即 CSV 列顺序"""
+    appid: str = ""
+    title: str = ""
+    released: str = ""
+    current_price: object = ""
+    original_price: object = ""
+    tags: str = ""
+
+
+@dataclass(slots=True)
+class Review(RecordMixin):
+    content: str = ""
+    page: int = 0
+    helpful: int = 0
+    language: str = "unknown"
+    author: str = ""
+    # 发布日期 YYYY-MM-DD，页面上取不到时为空
+    posted: str = ""
+
+
+@dataclass(slots=True)
+class ThreatCounts(RecordMixin):
+    links: int = 0
+    keywords: int = 0
+    contacts: int = 0
+    found_items: tuple = ()
+    keyword_hits: tuple = ()
+
+    def any(self):
+        return bool(self.links or self.keywords or self.contacts)
+
+
+@dataclass(slots=True)
+class SuspiciousReview(RecordMixin):
+    index: int = 0
+    content: str = ""
+    page: int = 0
+    helpful: int = 0
+    language: str = "unknown"
+    threats: ThreatCounts = None
+
+
+class ReviewBatch:
+    """按列存放一款游戏的评论：正文和评论者为字符串列表，页码/点赞数/语言/发布日期为定长数组"""
+    __slots__ = ("content", "page", "helpful", "language", "author", "posted")
+
+    def __init__(self):
+        self.content = []
+        self.page = array("I")
+        self.helpful = array("I")
+        self.language = array("B")
+        self.author = []
+        # 发布日期的公历序数，0 表示未知
+        self.posted = array("I")
+
+    def append(self, review):
+        self.content.append(review.content)
+        self.page.append(review.page)
+        self.helpful.append(review.helpful)
+        self.language.append(_LANGUAGE_CODES.get(review.language, 0))
+        self.author.append(review.author)
+        self.posted.append(date.fromisoformat(review.posted).toordinal() if review.posted else 0)
+
+    def extend(self, reviews):
+        for review in reviews:
+            self.append(review)
+
+    def __len__(self):
+        return len(self.content)
+
+    def __getitem__(self, i):
+        posted = date.fromordinal(self.posted[i]).isoformat() if self.posted[i] else ""
+        return Review(self.content[i], self.page[i], self.helpful[i], LANGUAGES[self.language[i]],
+                      self.author[i], posted)
+
+    def __iter__(self):
+        for i in range(len(self.content)):
+            yield self[i]
@@ -5,114 +5,117 @@
 快速查看收集到的數據概況
 """
 
-import pandas as pd
 import os
 from pathlib import Path
 
-BASE_DIR = Path(__file__).parent
+from csv_manifest import summarize, count_above, GAME_COLUMNS, COMMENT_COLUMNS
+
+BASE_DIR = Path(__file__).parent.parent
+
+def format_count(value):
+    return int(value) if float(value).is_integer() else value
 
 def show_data_overview():
-    """顯示數據概覽"""
+    """顯示數據概覽（讀取輸出旁的摘要文件，摘要過期時才重新掃描 CSV）"""
     print("🔍 Steam遊戲數據概覽")
     print("=" * 50)
     
     # 檢查文件
     files = {
-        "原始數據": BASE_DIR / "data" / "steam_topsellers_simple.csv",
-        "清洗數據": BASE_DIR / "data" / "steam_topsellers_simple_cleaned.csv", 
-        "評論分析": BASE_DIR / "data" / "comment_analysis_results.csv"
+        "原始數據": (BASE_DIR / "data" / "steam_topsellers_simple.csv", GAME_COLUMNS),
+        "清洗數據": (BASE_DIR / "data" / "steam_topsellers_simple_cleaned.csv", GAME_COLUMNS),
+        "評論分析": (BASE_DIR / "data" / "comment_analysis_results.csv", COMMENT_COLUMNS)
     }
     
-    for name, filepath in files.items():
+    for name, (filepath, columns) in files.items():
         if filepath.exists():
             try:
-                df = pd.read_csv(filepath)
-                print(f"✅ {name}: {len(df)} 條記錄")
+                summary = summarize(filepath, columns)
+                print(f"✅ {name}: {summary['row_count']} 條記錄")
                 
                 # 詳細統計
                 if name == "清洗數據":
-                    show_game_stats(df)
+                    show_game_stats(summary)
                 elif name == "評論分析":
-                    show_comment_stats(df)
+                    show_comment_stats(summary)
                     
             except Exception as e:
                 print(f"❌ {name}: 讀取失敗 - {e}")
         else:
             print(f"❌ {name}: 文件不存在")
 
-def show_game_stats(df):
+def show_game_stats(summary):
     """顯示遊戲數據統計"""
     print("  📊 遊戲數據統計:")
     
     # 基本統計
-    total = len(df)
+    total = summary['row_count']
+    columns = summary['columns']
     print(f"    總遊戲數: {total}")
     
     # 價格統計
     try:
-        paid_games = df[pd.to_numeric(df['original_price'], errors='coerce') > 0]
-        free_games = df[pd.to_numeric(df['original_price'], errors='coerce') == 0]
+        prices = columns['original_price']
+        paid_count = prices['positives']
+        free_count = prices['zeros']
         
-        print(f"    付費遊戲: {len(paid_games)} ({len(paid_games)/total*100:.1f}%)")
-        print(f"    免費遊戲: {len(free_games)} ({len(free_games)/total*100:.1f}%)")
+        print(f"    付費遊戲: {paid_count} ({paid_count/total*100:.1f}%)")
+        print(f"    免費遊戲: {free_count} ({free_count/total*100:.1f}%)")
         
-        if len(paid_games) > 0:
-            avg_price = pd.to_numeric(paid_games['original_price'], errors='coerce').mean()
+        if paid_count > 0:
+            avg_price = prices['sum_positive'] / paid_count
             print(f"    平均價格: ${avg_price:.2f}")
             
             # 價格範圍
-            prices = pd.to_numeric(paid_games['original_price'], errors='coerce').dropna()
-            if len(prices) > 0:
-                print(f"    價格範圍: ${prices.min():.2f} - ${prices.max():.2f}")
+            print(f"    價格範圍: ${prices['min_positive']:.2f} - ${prices['max']:.2f}")
     except Exception as e:
         print(f"    價格統計錯誤: {e}")
     
     # 折扣統計
     try:
-        if 'discounts' in df.columns:
-            discounted = df[pd.to_numeric(df['discounts'], errors='coerce') > 0]
-            print(f"    有折扣遊戲: {len(discounted)} ({len(discounted)/total*100:.1f}%)")
+        if 'discounts' in columns:
+            discounts = columns['discounts']
+            print(f"    有折扣遊戲: {discounts['positives']} ({discounts['positives']/total*100:.1f}%)")
             
-            if len(discounted) > 0:
-                avg_discount = pd.to_numeric(discounted['discounts'], errors='coerce').mean()
+            if discounts['positives'] > 0:
+                avg_discount = discounts['sum_positive'] / discounts['positives']
                 print(f"    平均折扣: {avg_discount:.1f}%")
     except Exception as e:
         print(f"    折扣統計錯誤: {e}")
 
-def show_comment_stats(df):
+def show_comment_stats(summary):
     """顯示評論分析統計"""
     print("  💬 評論分析統計:")
     
     try:
-        total_games = len(df)
+        total_games = summary['row_count']
+        columns = summary['columns']
         print(f"    分析遊戲數: {total_games}")
         
         # 總評論數
-        if 'total_reviews' in df.columns:
-            total_reviews = pd.to_numeric(df['total_reviews'], errors='coerce').sum()
-            print(f"    總評論數: {total_reviews}")
+        if 'total_reviews' in columns:
+            reviews = columns['total_reviews']
+            print(f"    總評論數: {format_count(reviews['sum'])}")
             
-            avg_reviews = pd.to_numeric(df['total_reviews'], errors='coerce').mean()
+            avg_reviews = reviews['sum'] / reviews['count']
             print(f"    平均每遊戲評論數: {avg_reviews:.1f}")
         
-        # 威脅統計
-        if 'threat_rate' in df.columns:
-            # 處理百分比字符串
-            threat_rates = df['threat_rate'].str.replace('%', '').astype(float)
-            avg_threat = threat_rates.mean()
-            max_threat = threat_rates.max()
+        # 威脅統計（百分比字符串已在摘要中轉為數值）
+        if 'threat_rate' in columns:
+            threat_rates = columns['threat_rate']
+            avg_threat = threat_rates['sum'] / threat_rates['count']
+            max_threat = threat_rates['max']
             
             print(f"    平均威脅率: {avg_threat:.1f}%")
             print(f"    最高威脅率: {max_threat:.1f}%")
             
             # 高威脅遊戲
-            high_threat = df[threat_rates > 10]
-            print(f"    高威脅遊戲(>10%): {len(high_threat)}")
+            print(f"    高威脅遊戲(>10%): {count_above(threat_rates, 10)}")
         
         # 語言統計
-        if 'chinese_reviews' in df.columns and 'english_reviews' in df.columns:
-            chinese_total = pd.to_numeric(df['chinese_reviews'], errors='coerce').sum()
-            english_total = pd.to_numeric(df['english_reviews'], errors='coerce').sum()
+        if 'chinese_reviews' in columns and 'english_reviews' in columns:
+            chinese_total = format_count(columns['chinese_reviews']['sum'])
+            english_total = format_count(columns['english_reviews']['sum'])
             
             print(f"    中文評論: {chinese_total}")
             print(f"    英文評論: {english_total}")
@@ -129,11 +132,11 @@ def show_top_games():
         return
     
     try:
-        df = pd.read_csv(cleaned_file)
+        rows = summarize(cleaned_file, GAME_COLUMNS)['head']
         print("\n🏆 TOP 10 熱門遊戲:")
         print("-" * 50)
         
-        for i, row in df.head(10).iterrows():
+        for i, row in enumerate(rows[:10]):
             title = row.get('title', 'N/A')
             price = row.get('original_price', 0)
             discount = row.get('discounts', 0)
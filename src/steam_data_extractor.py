@@ -1,8 +1,12 @@
 import sys
-import time
-import csv
 import re
-import os
+import time
+from html.parser import HTMLParser
+
+from records import SearchItem, Game
+from storage import CsvSink
+from perf_metrics import METRICS, timed_get, retry_get, timed_stream, parse_timer, sleep
+from parse_pool import parse
 
 try:
     import requests
@@ -20,18 +24,34 @@ HEADERS = {
                   "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 }
 
+# 榜单名 -> 搜索参数；"tag:<标签id>" 表示按标签筛选的列表，其他名字作为 filter 参数
+SEARCH_LISTS = {
+    "topsellers": {"filter": "topsellers"},
+    "specials": {"specials": 1},
+    "newreleases": {"sort_by": "Released_DESC"},
+    "popularnew": {"filter": "popularnew"},
+}
+
 OUT_CSV = "steam_topsellers_simple.csv"
 PAGES_TO_SCRAPE = 1
 DELAY = 0.2
 
 
+def search_params(list_name):
+    if list_name.startswith("tag:"):
+        return {"tags": list_name[4:]}
+    return dict(SEARCH_LISTS.get(list_name, {"filter": list_name}))
+
 def fetch_search_page(page=1, filter_name="topsellers"):
-    params = {"filter": filter_name, "page": page}
-    r = requests.get(BASE_SEARCH, params=params, headers=HEADERS, timeout=(8, 30))
+    params = dict(search_params(filter_name), page=page)
+    r = retry_get("search", BASE_SEARCH, params=params, headers=HEADERS, timeout=(8, 30))
     r.raise_for_status()
     return r.text
 
 def parse_search_html(html):
+    return parse("search", html)
+
+def _parse_search_html(html):
     soup = BeautifulSoup(html, "html.parser")
     rows = soup.select("a.search_result_row")
     out = []
@@ -47,21 +67,16 @@ def parse_search_html(html):
         te = a.select_one(".search_tags")
         if te:
             tags_text = ", ".join(t.strip() for t in te.get_text(separator="|").split("|") if t.strip())
-        out.append({
-            "appid": appid,
-            "title": title,
-            "released": released,
-            "price_text": price_text,
-            "tags_text": tags_text
-        })
+        out.append(SearchItem(appid, title, released, price_text, tags_text))
     return out
 
 def get_price_from_api(appid, cc="CN", lang="schinese"):
     try:
-        resp = requests.get(APPDETAILS_API, params={"appids": appid, "cc": cc, "l": lang},
-                            headers=HEADERS, timeout=(8, 15))
+        resp = timed_get("appdetails", APPDETAILS_API, params={"appids": appid, "cc": cc, "l": lang},
+                         headers=HEADERS, timeout=(8, 15))
         resp.raise_for_status()
-        data = resp.json()
+        with parse_timer("appdetails"):
+            data = resp.json()
         info = data.get(str(appid), {})
         if not info.get("success"):
             return None
@@ -77,26 +92,81 @@ def get_price_from_api(appid, cc="CN", lang="schinese"):
         return None
 
 def get_tags_from_app_page(appid):
+    """流式读取商店页，标签区块读完就断开连接，不下载和解析页面其余部分"""
     try:
         url = APP_URL.format(appid=appid)
-        r = requests.get(url, params={"l":"english"}, headers=HEADERS, timeout=(8, 20))
+        parser = AppTagParser()
+        parse_seconds = 0.0
+
+        def consume(text):
+            nonlocal parse_seconds
+            start = time.perf_counter()
+            parser.feed(text)
+            parse_seconds += time.perf_counter() - start
+            return parser.done
+
+        r = timed_stream("app_page", url, consume, params={"l": "english"}, headers=HEADERS, timeout=(8, 20))
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
-        tags = []
-        for a in soup.select("div.glance_tags.popular_tags a.app_tag"):
-            t = a.get_text(strip=True)
-            if t:
-                tags.append(t)
-        if not tags:
-            for a in soup.select("div.glance_tags a"):
-                t = a.get_text(strip=True)
-                if t and len(t) < 40:
-                    tags.append(t)
-        tags = list(dict.fromkeys(tags))
-        return ", ".join(tags)
+        METRICS.record_parse("app_page", parse_seconds)
+        return parser.tags()
     except Exception:
         return ""
 
+
+class AppTagParser(HTMLParser):
+    """增量解析商店页标签：取 div.glance_tags.popular_tags 中的 a.app_tag，
+    没有时退回任意 div.glance_tags 中短于 40 个字符的链接文本，结果按出现顺序去重。
+    popular_tags 区块结束即 done；只有普通 glance_tags 时需读到页尾再取备选结果"""
+
+    def __init__(self):
+        super().__init__()
+        self.done = False
+        self.popular = []
+        self.fallback = []
+        self._block = None
+        self._depth = 0
+        self._anchor = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        classes = (dict(attrs).get("class") or "").split()
+        if self._block is None:
+            if tag == "div" and "glance_tags" in classes:
+                self._block = "popular" if "popular_tags" in classes else "fallback"
+                self._depth = 1
+            return
+        if tag == "div":
+            self._depth += 1
+        elif tag == "a":
+            if self._block == "fallback" or "app_tag" in classes:
+                self._anchor = []
+
+    def handle_endtag(self, tag):
+        if self._block is None or self.done:
+            return
+        if tag == "a" and self._anchor is not None:
+            text = "".join(self._anchor)
+            if text and (self._block == "popular" or len(text) < 40):
+                (self.popular if self._block == "popular" else self.fallback).append(text)
+            self._anchor = None
+        elif tag == "div":
+            self._depth -= 1
+            if self._depth == 0:
+                if self._block == "popular" and self.popular:
+                    self.done = True
+                self._block = None
+
+    def handle_data(self, data):
+        if self._anchor is not None:
+            stripped = data.strip()
+            if stripped:
+                self._anchor.append(stripped)
+
+    def tags(self):
+        tags = self.popular or self.fallback
+        return ", ".join(dict.fromkeys(tags))
+
 def merge_tags(search_tags, page_tags):
     seen = []
     for t in (search_tags or "").split(","):
@@ -122,21 +192,11 @@ def price_fallback_from_text(price_text):
     current = nums[-1].replace(",", "")
     return (current, original)
 
-def save_csv(rows, filename=OUT_CSV):
-    keys = ["appid","title","released","current_price","original_price","tags"]
-    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
-    with open(filename, "w", newline='', encoding="utf-8-sig") as f:
-        writer = csv.DictWriter(f, fieldnames=keys)
-        writer.writeheader()
-        for r in rows:
-            writer.writerow({
-                "appid": r.get("appid",""),
-                "title": r.get("title",""),
-                "released": r.get("released",""),
-                "current_price": r.get("current_price",""),
-                "original_price": r.get("original_price",""),
-                "tags": r.get("tags","")
-            })
+def save_csv(rows, filename=OUT_CSV, sink=None):
+    """写出游戏表；传入 sink 时交给存储层（可同时写 SQLite），否则只写 CSV"""
+    if sink is None:
+        sink = CsvSink({"games": filename})
+    sink.write("games", rows)
 
 
 def main():
@@ -151,38 +211,32 @@ def main():
             print(f"本页抓到 {len(items)} 条")
         except Exception as e:
             print("抓取搜索页出错：", e)
-        time.sleep(DELAY)
+        sleep(DELAY, "search")
 
     out = []
     for i, it in enumerate(all_items, 1):
-        appid = it.get("appid", "").strip()
-        title = it.get("title", "").strip()
+        appid = it.appid.strip()
+        title = it.title.strip()
         print(f"[{i}/{len(all_items)}] {title[:60]}  (appid={appid})")
-        record = {"appid": appid, "title": title, "released": it.get("released", ""),
-                  "current_price": "", "original_price": "", "tags": ""}
+        record = Game(appid, title, it.released)
 
         if appid:
             price_info = get_price_from_api(appid, cc="CN", lang="schinese")
             if price_info and price_info.get("final") is not None:
-                record["current_price"] = str(price_info.get("final"))
-                record["original_price"] = str(price_info.get("initial")) if price_info.get(
+                record.current_price = str(price_info.get("final"))
+                record.original_price = str(price_info.get("initial")) if price_info.get(
                     "initial") is not None else ""
             else:
-                cur, orig = price_fallback_from_text(it.get("price_text", ""))
-                record["current_price"] = cur
-                record["original_price"] = orig
+                record.current_price, record.original_price = price_fallback_from_text(it.price_text)
 
             tags_page = get_tags_from_app_page(appid)
-            merged = merge_tags(it.get("tags_text", ""), tags_page)
-            record["tags"] = merged
+            record.tags = merge_tags(it.tags_text, tags_page)
         else:
-            cur, orig = price_fallback_from_text(it.get("price_text", ""))
-            record["current_price"] = cur
-            record["original_price"] = orig
-            record["tags"] = it.get("tags_text", "")
+            record.current_price, record.original_price = price_fallback_from_text(it.price_text)
+            record.tags = it.tags_text
 
         out.append(record)
-        time.sleep(DELAY)
+        sleep(DELAY, "enrich")
 
     save_csv(out)
     print(f"完成，保存 {len(out)} 条到 {OUT_CSV}")
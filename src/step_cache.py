@@ -0,0 +1,63 @@
+import hashlib
+import json
+import os
+import time
+
+from csv_manifest import file_hash
+
+# 类 make 的步骤缓存：记录每一步输入文件哈希 + 参数，以及输出文件哈希，
+# 两者都未变化时跳过该步骤
+CACHE_VERSION = 1
+
+
+class StepCache:
+
+    def __init__(self, cache_file):
+        self.cache_file = str(cache_file)
+        self.entries = {}
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                self.entries = data.get("steps", {})
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def step_key(self, step, inputs=(), params=None):
+        h = hashlib.sha256()
+        h.update(json.dumps([CACHE_VERSION, step, params or {}], sort_keys=True, default=str).encode("utf-8"))
+        for path in inputs:
+            path = str(path)
+            h.update(path.encode("utf-8"))
+            h.update((file_hash(path) if os.path.exists(path) else "missing").encode("utf-8"))
+        return h.hexdigest()
+
+    def is_fresh(self, step, key, max_age=None):
+        entry = self.entries.get(step)
+        if not entry or entry.get("key") != key:
+            return False
+        if max_age is not None and time.time() - entry.get("time", 0) > max_age:
+            return False
+        for path, digest in entry.get("outputs", {}).items():
+            if not os.path.exists(path) or file_hash(path) != digest:
+                return False
+        return True
+
+    def record(self, step, key, outputs=()):
+        self.entries[step] = {
+            "key": key,
+            "time": time.time(),
+            "outputs": {str(p): file_hash(str(p)) for p in outputs if os.path.exists(str(p))}
+        }
+        self._save()
+
+    def invalidate(self, step):
+        if self.entries.pop(step, None) is not None:
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+        tmp = self.cache_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "steps": self.entries}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.cache_file)
@@ -0,0 +1,255 @@
+import csv
+import os
+import sqlite3
+import sys
+import time
+
+from csv_manifest import write_manifest, GAME_COLUMNS, COMMENT_COLUMNS, SUSPICIOUS_COLUMNS, COUNT_EDGES
+from records import Game
+
+# 输出存储：CsvSink 整表重写 CSV（下游步骤和统计脚本读取的格式），
+# SqliteSink 按主键 upsert 到 SQLite，单个 appid 的查询和增量更新不必重写整份文件。
+# 两者接口相同，可以用 MultiSink 同时写入
+TABLES = {
+    "games": {
+        "columns": Game.field_names(),
+        "key": ["appid"],
+        "manifest": GAME_COLUMNS,
+    },
+    "comment_analysis": {
+        "columns": ["appid", "title", "total_reviews", "suspicious_reviews", "threat_rate",
+                    "links", "keywords", "contacts", "avg_helpful", "chinese_reviews", "english_reviews",
+                    "threat_rate_ci_low", "threat_rate_ci_high"],
+        "key": ["appid"],
+        "manifest": COMMENT_COLUMNS,
+    },
+    "suspicious_reviews": {
+        "columns": ["appid", "game_title", "review_index", "review_content", "page", "helpful",
+                    "language", "has_links", "has_keywords", "has_contacts",
+                    "link_count", "keyword_count", "contact_count"],
+        "key": ["appid", "review_index"],
+        "manifest": SUSPICIOUS_COLUMNS,
+        # 每次分析都会给出该游戏的完整可疑评论列表，写入前先删掉旧的
+        "replace_by": "appid",
+    },
+    "list_ranks": {
+        "columns": ["appid", "list_name", "rank"],
+        "key": ["appid", "list_name"],
+        "manifest": {"rank": COUNT_EDGES},
+    },
+}
+STORAGE_KINDS = ("csv", "sqlite", "both")
+
+
+def write_csv_table(table, rows, csv_file):
+    spec = TABLES[table]
+    os.makedirs(os.path.dirname(str(csv_file)) or ".", exist_ok=True)
+    with open(csv_file, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=spec["columns"], extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    write_manifest(str(csv_file), rows, spec["manifest"])
+
+
+class CsvSink:
+
+    def __init__(self, files):
+        # {表名: CSV 路径}，未配置路径的表不写
+        self.files = {table: str(path) for table, path in files.items()}
+
+    def write(self, table, rows):
+        if table in self.files:
+            write_csv_table(table, rows, self.files[table])
+
+    def describe(self, table):
+        return os.path.basename(self.files[table]) if table in self.files else None
+
+    def outputs(self, table):
+        return [self.files[table]] if table in self.files else []
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SqliteSink:
+
+    def __init__(self, db_file, batch_size=500):
+        self.db_file = str(db_file)
+        self.batch_size = batch_size
+        os.makedirs(os.path.dirname(self.db_file) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.db_file)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        with self.conn:
+            for table, spec in TABLES.items():
+                columns = ", ".join(f'"{c}"' for c in spec["columns"])
+                key = ", ".join(spec["key"])
+                self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} "
+                                  f"({columns}, crawled_at REAL, PRIMARY KEY ({key}))")
+                # 旧数据库缺少后来新增的列时补上
+                existing = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+                for c in spec["columns"]:
+                    if c not in existing:
+                        self.conn.execute(f'ALTER TABLE {table} ADD COLUMN "{c}"')
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_appid ON {table} (appid)")
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_crawled_at ON {table} (crawled_at)")
+
+    def write(self, table, rows, crawled_at=None):
+        """批量 upsert，每 batch_size 行一个事务；按分组整体替换的表在一个事务里先删后写，
+        中途出错时旧行保持不变"""
+        spec = TABLES[table]
+        columns = spec["columns"] + ["crawled_at"]
+        names = ", ".join(f'"{c}"' for c in columns)
+        placeholders = ", ".join("?" for _ in columns)
+        updates = ", ".join(f'"{c}" = excluded."{c}"' for c in columns if c not in spec["key"])
+        sql = (f"INSERT INTO {table} ({names}) VALUES ({placeholders}) "
+               f"ON CONFLICT ({', '.join(spec['key'])}) DO UPDATE SET {updates}")
+        crawled_at = crawled_at or time.time()
+        rows = list(rows)
+        replace_by = spec.get("replace_by")
+
+        def insert(batch):
+            self.conn.executemany(sql, [
+                [_sql_value(row.get(c, "")) for c in spec["columns"]] + [crawled_at] for row in batch
+            ])
+
+        if replace_by:
+            # 先一次性删掉本次涉及的所有分组；按批删除时，跨批的同一 appid 会删掉前一批刚写入的行
+            groups = {(str(row.get(replace_by, "")),) for row in rows}
+            with self.conn:
+                self.conn.executemany(f"DELETE FROM {table} WHERE {replace_by} = ?", groups)
+                for start in range(0, len(rows), self.batch_size):
+                    insert(rows[start:start + self.batch_size])
+            return
+        for start in range(0, len(rows), self.batch_size):
+            with self.conn:
+                insert(rows[start:start + self.batch_size])
+
+    def get(self, table, appid):
+        cursor = self.conn.execute(f"SELECT * FROM {table} WHERE appid = ?", (str(appid),))
+        return [dict(row) for row in cursor]
+
+    def rows(self, table, since=None):
+        """按抓取时间顺序返回整表，since 为时间戳时只返回之后写入的行"""
+        if since is None:
+            cursor = self.conn.execute(f"SELECT * FROM {table} ORDER BY crawled_at")
+        else:
+            cursor = self.conn.execute(f"SELECT * FROM {table} WHERE crawled_at >= ? ORDER BY crawled_at",
+                                       (since,))
+        return [dict(row) for row in cursor]
+
+    def count(self, table):
+        return self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def export_csv(self, table, csv_file):
+        rows = self.rows(table)
+        write_csv_table(table, rows, csv_file)
+        return len(rows)
+
+    def describe(self, table):
+        return f"{os.path.basename(self.db_file)}:{table}"
+
+    def outputs(self, table):
+        return [self.db_file]
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MultiSink:
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def write(self, table, rows):
+        rows = list(rows)
+        for sink in self.sinks:
+            sink.write(table, rows)
+
+    def describe(self, table):
+        return ", ".join(d for d in (s.describe(table) for s in self.sinks) if d)
+
+    def outputs(self, table):
+        return [p for s in self.sinks for p in s.outputs(table)]
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _sql_value(value):
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return str(value)
+
+
+def open_sink(storage, csv_files, db_file):
+    """storage 为 csv / sqlite / both；games 表始终写 CSV，步骤2以它为输入"""
+    if storage not in STORAGE_KINDS:
+        raise ValueError(f"未知的存储类型: {storage}")
+    if storage == "csv":
+        return CsvSink(csv_files)
+    games_csv = {t: p for t, p in csv_files.items() if t == "games"}
+    csv_sink = CsvSink(csv_files if storage == "both" else games_csv)
+    return MultiSink([csv_sink, SqliteSink(db_file)])
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='查询或导出 SQLite 存储')
+    parser.add_argument('--db', type=str,
+                        default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                             "data", "steam.db"),
+                        help='数据库路径 (默认 data/steam.db)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    get_cmd = sub.add_parser('get', help='查询单个 appid')
+    get_cmd.add_argument('table', choices=list(TABLES))
+    get_cmd.add_argument('appid')
+    export_cmd = sub.add_parser('export', help='导出整表为 CSV')
+    export_cmd.add_argument('table', choices=list(TABLES))
+    export_cmd.add_argument('csv_file')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"错误：找不到数据库 {args.db}")
+        sys.exit(1)
+    with SqliteSink(args.db) as sink:
+        if args.command == 'get':
+            rows = sink.get(args.table, args.appid)
+            if not rows:
+                print(f"{args.table} 中没有 appid={args.appid}")
+            for row in rows:
+                for k, v in row.items():
+                    print(f"{k}: {v}")
+                print()
+        else:
+            n = sink.export_csv(args.table, args.csv_file)
+            print(f"已导出 {n} 行 -> {args.csv_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from array import array
+
+from records import ThreatCounts
+
+# 评论威胁规则包：规则放在带版本号的 JSON 文件里（默认 data/threat_rules.json），
+# 第一次检测时才读取并编译（校验、排序、为关键词建索引），不落盘任何编译产物：
+# 规则包目录里只有 JSON，不从数据目录反序列化 pickle。
+# 长时间运行的分析进程按 check_interval 检查规则包，
+# 文件变化后热加载；新规则包有错误时继续使用旧规则。
+# 每条规则累计命中次数与匹配耗时，用来找出耗时高却从不命中的规则。
+# 命中次数精确统计；耗时每 TIMING_SAMPLE 条评论计时一次再按比例放大，避免计时本身拖慢检测
+PACK_VERSION = 1
+KINDS = ("link", "contact", "keyword")
+TIMING_SAMPLE = 8
+DEFAULT_PACK_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 "data", "threat_rules.json")
+
+_rules = None
+_pack_file = DEFAULT_PACK_FILE
+_check_interval = 1.0
+_lock = threading.Lock()
+
+
+def configure(pack_file=None, check_interval=1.0):
+    """只记录规则包路径，第一次检测时才加载，不做评论分析的步骤不受规则包错误影响"""
+    global _rules, _pack_file, _check_interval
+    with _lock:
+        _rules = None
+        _pack_file = str(pack_file or DEFAULT_PACK_FILE)
+        _check_interval = check_interval
+
+
+def pack_file():
+    return _pack_file
+
+
+def loaded():
+    """已加载的规则集，还没加载过时返回 None"""
+    return _rules
+
+
+def current():
+    """当前规则集，第一次调用时加载；规则包不存在或有错误时抛出 OSError/ValueError"""
+    global _rules
+    if _rules is None:
+        with _lock:
+            if _rules is None:
+                _rules = ThreatRules(_pack_file, check_interval=_check_interval)
+    return _rules
+
+
+def _source_signature(pack_file):
+    st = os.stat(pack_file)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+class CompiledRules:
+    """按 链接 → 联系方式 → 关键词 排好序的规则。关键词按小写首字符建索引，
+    评论里没有出现的首字符对应的关键词不必逐个查找"""
+
+    def __init__(self, name, revision, ids, kinds, patterns, keyword_index):
+        self.name = name
+        self.revision = revision
+        self.ids = ids
+        self.kinds = kinds
+        # link/contact 为编译后的正则，keyword 为 (原文, 小写) 二元组
+        self.patterns = patterns
+        self.keyword_index = keyword_index
+        self.regex_count = sum(1 for k in kinds if k != "keyword")
+
+    @classmethod
+    def from_pack(cls, pack):
+        if pack.get("version") != PACK_VERSION:
+            raise ValueError(f"不支持的规则包版本: {pack.get('version')}")
+        rules = sorted(pack.get("rules", []), key=lambda r: KINDS.index(r.get("kind"))
+                       if r.get("kind") in KINDS else -1)
+        ids, kinds, patterns = [], [], []
+        seen = set()
+        keyword_index = {}
+        for rule in rules:
+            rule_id, kind, pattern = rule.get("id"), rule.get("kind"), rule.get("pattern")
+            if not rule_id or rule_id in seen:
+                raise ValueError(f"规则 id 为空或重复: {rule_id!r}")
+            if kind not in KINDS:
+                raise ValueError(f"规则 {rule_id} 类型未知: {kind!r}")
+            if not pattern:
+                raise ValueError(f"规则 {rule_id} 没有 pattern")
+            if kind == "keyword":
+                lowered = pattern.lower()
+                keyword_index.setdefault(lowered[0], []).append(len(ids))
+                patterns.append((pattern, lowered))
+            else:
+                flags = re.IGNORECASE if rule.get("ignore_case") else 0
+                try:
+                    patterns.append(re.compile(pattern, flags))
+                except re.error as e:
+                    raise ValueError(f"规则 {rule_id} 正则无效: {e}") from None
+            seen.add(rule_id)
+            ids.append(rule_id)
+            kinds.append(kind)
+        return cls(pack.get("name", ""), pack.get("revision", 0), ids, kinds, patterns, keyword_index)
+
+    def rule_keys(self):
+        """(id, 类型, 模式)，热加载时据此判断规则是否未变、统计能否沿用"""
+        return [(rule_id, kind, p[0] if kind == "keyword" else p.pattern)
+                for rule_id, kind, p in zip(self.ids, self.kinds, self.patterns)]
+
+    def keywords(self):
+        return [p[0] for kind, p in zip(self.kinds, self.patterns) if kind == "keyword"]
+
+    def match(self, text, hits, elapsed_ns=None):
+        """返回 ThreatCounts；命中次数累加到 hits，给出 elapsed_ns 时逐条计时（均为与规则同序的列表）"""
+        if elapsed_ns is None:
+            return self._match(text, hits)
+        clock = time.perf_counter_ns
+        links, contacts, keywords = [], [], []
+        for i in range(self.regex_count):
+            start = clock()
+            found = self.patterns[i].findall(text)
+            elapsed_ns[i] += clock() - start
+            if found:
+                hits[i] += len(found)
+                (links if self.kinds[i] == "link" else contacts).extend(found)
+        lowered = text.lower()
+        candidates = []
+        for ch in set(lowered).intersection(self.keyword_index):
+            candidates.extend(self.keyword_index[ch])
+        # 保持规则包中的顺序
+        for i in sorted(candidates):
+            start = clock()
+            matched = self.patterns[i][1] in lowered
+            elapsed_ns[i] += clock() - start
+            if matched:
+                hits[i] += 1
+                keywords.append(self.patterns[i][0])
+        return ThreatCounts(len(links), len(keywords), len(contacts), tuple(links + contacts + keywords),
+                            tuple(keywords))
+
+    def _match(self, text, hits):
+        links, contacts, keywords = [], [], []
+        for i in range(self.regex_count):
+            found = self.patterns[i].findall(text)
+            if found:
+                hits[i] += len(found)
+                (links if self.kinds[i] == "link" else contacts).extend(found)
+        lowered = text.lower()
+        candidates = []
+        for ch in set(lowered).intersection(self.keyword_index):
+            candidates.extend(self.keyword_index[ch])
+        for i in sorted(candidates):
+            if self.patterns[i][1] in lowered:
+                hits[i] += 1
+                keywords.append(self.patterns[i][0])
+        return ThreatCounts(len(links), len(keywords), len(contacts), tuple(links + contacts + keywords),
+                            tuple(keywords))
+
+
+def load_pack(pack_file):
+    """读取并编译规则包；文件不存在抛出 OSError，格式或规则有误抛出 ValueError"""
+    with open(pack_file, "r", encoding="utf-8") as f:
+        return CompiledRules.from_pack(json.load(f))
+
+
+class ThreatRules:
+    """可热加载的规则集，多个线程可以同时 detect"""
+
+    def __init__(self, pack_file, check_interval=1.0):
+        self.pack_file = str(pack_file)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self.compiled = load_pack(self.pack_file)
+        self.signature = _source_signature(self.pack_file)
+        self.hits = array("Q", bytes(8 * len(self.compiled.ids)))
+        self.elapsed_ns = array("Q", bytes(8 * len(self.compiled.ids)))
+        self.texts = 0
+        self.reloads = 0
+        self._next_check = time.monotonic() + check_interval
+
+    def maybe_reload(self):
+        """距上次检查超过 check_interval 且规则包有变化时重新加载，返回是否换了规则"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.check_interval
+        signature = self.signature
+        try:
+            signature = _source_signature(self.pack_file)
+            if signature == self.signature:
+                return False
+            compiled = load_pack(self.pack_file)
+        except (OSError, ValueError) as e:
+            print(f"威胁规则包加载失败，继续使用旧规则: {e}")
+            # 同一个有问题的文件不再重复加载，等它再次变化
+            self.signature = signature
+            return False
+        with self._lock:
+            old = {key: i for i, key in enumerate(self.compiled.rule_keys())}
+            hits = array("Q", bytes(8 * len(compiled.ids)))
+            elapsed_ns = array("Q", bytes(8 * len(compiled.ids)))
+            # 未变化的规则沿用累计统计
+            for i, key in enumerate(compiled.rule_keys()):
+                j = old.get(key)
+                if j is not None:
+                    hits[i] = self.hits[j]
+                    elapsed_ns[i] = self.elapsed_ns[j]
+            self.compiled, self.signature = compiled, signature
+            self.hits, self.elapsed_ns = hits, elapsed_ns
+            self.reloads += 1
+        print(f"威胁规则包已重新加载: {compiled.name} r{compiled.revision}，{len(compiled.ids)} 条规则")
+        return True
+
+    def detect(self, text):
+        self.maybe_reload()
+        compiled = self.compiled
+        n = len(compiled.ids)
+        hits = [0] * n
+        timed = self.texts % TIMING_SAMPLE == 0
+        elapsed_ns = [0] * n if timed else None
+        result = compiled.match(text or "", hits, elapsed_ns)
+        with self._lock:
+            # 检测期间规则被替换时丢弃这一条的统计
+            if compiled is self.compiled:
+                for i, h in enumerate(hits):
+                    if h:
+                        self.hits[i] += h
+                if timed:
+                    for i, ns in enumerate(elapsed_ns):
+                        self.elapsed_ns[i] += ns * TIMING_SAMPLE
+                self.texts += 1
+        return result
+
+    def keywords(self):
+        return self.compiled.keywords()
+
+    def stats(self):
+        with self._lock:
+            return {"pack": self.compiled.name, "revision": self.compiled.revision,
+                    "texts": self.texts, "reloads": self.reloads,
+                    "rules": [{"id": rule_id, "kind": kind, "hits": self.hits[i],
+                               "seconds": self.elapsed_ns[i] / 1e9}
+                              for i, (rule_id, kind) in enumerate(zip(self.compiled.ids, self.compiled.kinds))]}
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='校验威胁规则包或查看每条规则的命中与耗时')
+    sub = parser.add_subparsers(dest='command', required=True)
+    check_cmd = sub.add_parser('check', help='校验规则包')
+    check_cmd.add_argument('pack', nargs='?', default=DEFAULT_PACK_FILE, help='规则包路径 (默认 data/threat_rules.json)')
+    stats_cmd = sub.add_parser('stats', help='按耗时排序显示规则统计')
+    stats_cmd.add_argument('metrics', nargs='?',
+                           default=os.path.join(os.path.dirname(DEFAULT_PACK_FILE), "metrics", "metrics.json"),
+                           help='流水线写出的 metrics.json (默认 data/metrics/metrics.json)')
+    stats_cmd.add_argument('--unused', action='store_true', help='只显示从未命中的规则')
+    args = parser.parse_args()
+
+    if args.command == 'check':
+        try:
+            compiled = load_pack(args.pack)
+        except (OSError, ValueError) as e:
+            print(f"错误：{e}")
+            sys.exit(1)
+        counts = {kind: compiled.kinds.count(kind) for kind in KINDS}
+        print(f"{compiled.name} r{compiled.revision}: {len(compiled.ids)} 条规则 {counts}")
+        return
+    try:
+        with open(args.metrics, "r", encoding="utf-8") as f:
+            data = json.load(f).get("threat_rules")
+    except (FileNotFoundError, ValueError):
+        data = None
+    if not data:
+        print("没有规则统计，先运行一次步骤3")
+        return
+    print(f"{data['pack']} r{data['revision']}：检测 {data['texts']} 条评论，热加载 {data['reloads']} 次")
+    rules = sorted(data["rules"], key=lambda r: -r["seconds"])
+    if args.unused:
+        rules = [r for r in rules if not r["hits"]]
+    for r in rules:
+        per_text = r["seconds"] / data["texts"] * 1e6 if data["texts"] else 0
+        print(f"{r['id']:<28}{r['kind']:<9}命中 {r['hits']:>7}  耗时 {r['seconds'] * 1000:>9.2f}ms"
+              f"  ({per_text:.2f}µs/条)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+import base64
+import hashlib
+import json
+import math
+import os
+import sys
+import threading
+import time
+from array import array
+
+# 跨多次运行跟踪每款游戏的评论威胁趋势，不保留评论本身：
+# HyperLogLog 估计不同评论者数，count-min 统计可疑关键词命中，按天分桶的计数器给出滑动窗口内的威胁率。
+# 三种结构都可合并（HLL 取寄存器最大值，其余相加），每款游戏占用内存固定（约 5KB + 分桶数 + 已计入评论的哈希）。
+# 每次运行都会重新抓到最新的那批评论，只有 HLL 天然幂等，其余计数按评论键（评论者主页，没有时用正文）
+# 去重：每款游戏保留最近 MAX_SEEN 条已计入评论的 64 位哈希。分桶按评论发布日期，取不到日期时按抓取时间
+TRENDS_VERSION = 2
+HLL_PRECISION = 10
+CMS_WIDTH = 256
+CMS_DEPTH = 4
+BUCKET_SECONDS = 24 * 3600
+MAX_BUCKETS = 90
+MAX_SEEN = 2048
+
+
+def _hash64(value, salt=b""):
+    digest = hashlib.blake2b(str(value).encode("utf-8"), digest_size=8, salt=salt).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _pack(arr):
+    if sys.byteorder == "big":
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return base64.b64encode(arr.tobytes()).decode("ascii")
+
+
+def _unpack(typecode, text):
+    arr = array(typecode)
+    arr.frombytes(base64.b64decode(text))
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr
+
+
+class HyperLogLog:
+
+    def __init__(self, p=HLL_PRECISION, registers=None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = registers if registers is not None else array("B", bytes(self.m))
+
+    def add(self, value):
+        x = _hash64(value)
+        idx = x & (self.m - 1)
+        w = x >> self.p
+        rank = (64 - self.p) - w.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            # 小基数用线性计数修正
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+    def merge(self, other):
+        for i, r in enumerate(other.registers):
+            if r > self.registers[i]:
+                self.registers[i] = r
+
+
+class CountMinSketch:
+
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH, table=None):
+        self.width = width
+        self.depth = depth
+        self.table = table if table is not None else array("I", bytes(4 * width * depth))
+
+    def _cells(self, item):
+        for d in range(self.depth):
+            yield d * self.width + _hash64(item, salt=bytes([d])) % self.width
+
+    def add(self, item, n=1):
+        for cell in self._cells(item):
+            self.table[cell] += n
+
+    def estimate(self, item):
+        return min(self.table[cell] for cell in self._cells(item))
+
+    def merge(self, other):
+        for i, v in enumerate(other.table):
+            self.table[i] += v
+
+
+class TimeBuckets:
+    """按天分桶的 [评论数, 可疑数]，只保留最近 MAX_BUCKETS 个桶"""
+
+    def __init__(self, bucket_seconds=BUCKET_SECONDS, max_buckets=MAX_BUCKETS, buckets=None):
+        self.bucket_seconds = bucket_seconds
+        self.max_buckets = max_buckets
+        self.buckets = buckets if buckets is not None else {}
+
+    def add(self, ts, reviews, suspicious):
+        start = int(ts) // self.bucket_seconds * self.bucket_seconds
+        bucket = self.buckets.setdefault(start, [0, 0])
+        bucket[0] += reviews
+        bucket[1] += suspicious
+        self._trim()
+
+    def _trim(self):
+        if len(self.buckets) > self.max_buckets:
+            for start in sorted(self.buckets)[:len(self.buckets) - self.max_buckets]:
+                del self.buckets[start]
+
+    def window(self, seconds, now=None):
+        """最近 seconds 秒内的 (评论数, 可疑数)"""
+        since = (now if now is not None else time.time()) - seconds
+        reviews = suspicious = 0
+        for start, (r, s) in self.buckets.items():
+            if start + self.bucket_seconds > since:
+                reviews += r
+                suspicious += s
+        return reviews, suspicious
+
+    def merge(self, other):
+        for start, (r, s) in other.buckets.items():
+            bucket = self.buckets.setdefault(start, [0, 0])
+            bucket[0] += r
+            bucket[1] += s
+        self._trim()
+
+
+def review_key(author, content):
+    return _hash64(author) if author else _hash64("text:" + (content or ""))
+
+
+class GameTrend:
+
+    def __init__(self, known=()):
+        self.reviewers = HyperLogLog()
+        self.keywords = CountMinSketch()
+        self.buckets = TimeBuckets()
+        self.reviews = 0
+        self.suspicious = 0
+        # 已计入的评论键，按计入顺序，超过 MAX_SEEN 时丢弃最早的
+        self.seen = {}
+        # 之前运行已计入的评论键（只读），本次不再重复计数
+        self.known = known
+
+    def add_review(self, key, author, threats, ts=None):
+        """计入一条评论；key 已计入过时跳过并返回 False。ts 为评论发布时间，缺省为当前时间"""
+        if key in self.seen or key in self.known:
+            return False
+        ts = ts if ts is not None else time.time()
+        if author:
+            self.reviewers.add(author)
+        for keyword in threats.keyword_hits:
+            self.keywords.add(keyword)
+        self.reviews += 1
+        self.suspicious += 1 if threats.any() else 0
+        self.buckets.add(ts, 1, 1 if threats.any() else 0)
+        self._remember(key)
+        return True
+
+    def _remember(self, key):
+        self.seen[key] = None
+        if len(self.seen) > MAX_SEEN:
+            del self.seen[next(iter(self.seen))]
+
+    def merge(self, other):
+        """other 为另一次运行的增量；两边都计入过的评论（并发运行同一游戏时）会被重复计数"""
+        self.reviewers.merge(other.reviewers)
+        self.keywords.merge(other.keywords)
+        self.buckets.merge(other.buckets)
+        self.reviews += other.reviews
+        self.suspicious += other.suspicious
+        for key in other.seen:
+            self.seen.pop(key, None)
+            self._remember(key)
+
+    def to_dict(self):
+        return {
+            "reviewers": _pack(self.reviewers.registers),
+            "keywords": _pack(self.keywords.table),
+            "buckets": [[start, r, s] for start, (r, s) in sorted(self.buckets.buckets.items())],
+            "reviews": self.reviews,
+            "suspicious": self.suspicious,
+            "seen": _pack(array("Q", self.seen)),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        trend = cls()
+        trend.reviewers = HyperLogLog(registers=_unpack("B", data["reviewers"]))
+        trend.keywords = CountMinSketch(table=_unpack("I", data["keywords"]))
+        trend.buckets = TimeBuckets(buckets={b[0]: [b[1], b[2]] for b in data["buckets"]})
+        trend.reviews = data["reviews"]
+        trend.suspicious = data["suspicious"]
+        trend.seen = dict.fromkeys(_unpack("Q", data.get("seen", "")))
+        return trend
+
+
+class ThreatTrends:
+    """按 appid 汇总的趋势。本次运行的增量先在内存中合并，save() 时与磁盘上的状态合并后写回，
+    多个线程可以同时 merge_game，多次运行之间互不覆盖"""
+
+    def __init__(self, store_file):
+        self.store_file = str(store_file)
+        self.pending = {}
+        self._stored = None
+        self._lock = threading.Lock()
+
+    def new_trend(self, appid):
+        """本次运行某款游戏的增量，已存盘或本次已计入的评论不会再被计入"""
+        with self._lock:
+            if self._stored is None:
+                self._stored = self.load()
+            known = set()
+            for source in (self._stored, self.pending):
+                trend = source.get(str(appid))
+                if trend is not None:
+                    known.update(trend.seen)
+        return GameTrend(known=frozenset(known))
+
+    def merge_game(self, appid, trend):
+        with self._lock:
+            existing = self.pending.get(str(appid))
+            if existing is None:
+                self.pending[str(appid)] = trend
+            else:
+                existing.merge(trend)
+
+    def load(self):
+        try:
+            with open(self.store_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        if data.get("version") != TRENDS_VERSION:
+            return {}
+        return {appid: GameTrend.from_dict(d) for appid, d in data.get("games", {}).items()}
+
+    def snapshot(self):
+        """磁盘状态与未保存增量合并后的结果"""
+        games = self.load()
+        with self._lock:
+            for appid, trend in self.pending.items():
+                if appid in games:
+                    games[appid].merge(trend)
+                else:
+                    games[appid] = GameTrend.from_dict(trend.to_dict())
+        return games
+
+    def save(self):
+        with self._lock:
+            if not self.pending:
+                return
+        games = self.snapshot()
+        os.makedirs(os.path.dirname(self.store_file) or ".", exist_ok=True)
+        tmp = f"{self.store_file}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": TRENDS_VERSION,
+                       "games": {appid: t.to_dict() for appid, t in games.items()}}, f)
+        os.replace(tmp, self.store_file)
+        with self._lock:
+            self.pending = {}
+            self._stored = games
+
+
+def main():
+    import argparse
+    import threat_rules
+    parser = argparse.ArgumentParser(description='查看每款游戏的评论威胁趋势')
+    parser.add_argument('appid', nargs='?', default=None, help='只看指定 appid')
+    parser.add_argument('--file', type=str,
+                        default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                             "data", "threat_trends.json"),
+                        help='趋势文件 (默认 data/threat_trends.json)')
+    parser.add_argument('--window-days', type=int, default=7, help='滑动窗口天数 (默认7)')
+    parser.add_argument('--top', type=int, default=5, help='显示命中最多的关键词数 (默认5)')
+    args = parser.parse_args()
+
+    games = ThreatTrends(args.file).load()
+    if args.appid:
+        games = {args.appid: games[args.appid]} if args.appid in games else {}
+    if not games:
+        print("没有趋势数据")
+        return
+    for appid, trend in sorted(games.items(), key=lambda kv: -kv[1].suspicious):
+        reviews, suspicious = trend.buckets.window(args.window_days * 24 * 3600)
+        window_rate = suspicious / reviews * 100 if reviews else 0
+        total_rate = trend.suspicious / trend.reviews * 100 if trend.reviews else 0
+        top = sorted(((trend.keywords.estimate(k), k) for k in threat_rules.current().keywords()), reverse=True)[:args.top]
+        print(f"appid={appid}  评论 {trend.reviews} 条，约 {trend.reviewers.count()} 位评论者")
+        print(f"  威胁率：累计 {total_rate:.1f}%，最近 {args.window_days} 天 {window_rate:.1f}% ({reviews} 条)")
+        print("  关键词：" + ", ".join(f"{k}×{n}" for n, k in top if n))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import math
+import os
+import random
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, os.path.join(SRC_DIR, "benchmarks"))
+
+import aggregate_cube as ac  # noqa: E402
+from synthetic import synthetic_game_row  # noqa: E402
+
+
+def synthetic_rows(n, seed=42):
+    rng = random.Random(seed)
+    return [synthetic_game_row(i, rng) for i in range(n)]
+
+
+def assert_same_cells(a, b):
+    assert a["cells"].keys() == b["cells"].keys()
+    for key, values in a["cells"].items():
+        assert all(math.isclose(x, y, abs_tol=1e-6) for x, y in zip(values, b["cells"][key])), key
+
+
+def test_build_matches_row_by_row_update():
+    rows = synthetic_rows(500)
+    incremental = ac.new_cube()
+    ac.update_cube(incremental, rows)
+    built = ac.build_cube(rows)
+    assert built["rows"] == incremental["rows"]
+    assert_same_cells(built, incremental)
+
+
+def test_incremental_update_matches_rebuild():
+    rows = synthetic_rows(300)
+    cube = ac.build_cube(rows[:200])
+    changed = [dict(r) for r in rows[100:]]
+    for row in changed[:20]:
+        row["current_price"] = 0.0
+        row["tags"] = "Indie, Puzzle"
+    added, updated, removed = ac.update_cube(cube, changed, replace=True)
+    assert (added, updated, removed) == (100, 20, 100)
+    assert_same_cells(cube, ac.build_cube(changed))
+
+
+def test_removed_cells_are_dropped():
+    rows = synthetic_rows(50)
+    cube = ac.build_cube(rows)
+    ac.update_cube(cube, [], replace=True)
+    assert cube["cells"] == {}
+    # 状态与单元格不一致时减去贡献也不会留下负数单元格
+    ac._apply(cube["cells"], ac._contribution(rows[0]), -1)
+    assert cube["cells"] == {}
+
+
+def test_genres_use_substring_match():
+    row = {"appid": "1", "released": "1 Jan, 2020", "current_price": "5", "original_price": "10",
+           "tags": "Action RPG, JRPG, Indie"}
+    cube = ac.build_cube([row])
+    genres = {k[1][len(ac.GENRE_PREFIX):] for k in cube["cells"] if k[1].startswith(ac.GENRE_PREFIX)}
+    assert genres == {"Action", "RPG", "Indie"}
+    assert (2020, "Action RPG", 0, 1, 2) in cube["cells"]
+
+
+def test_update_cube_file_round_trip(tmp_path):
+    csv_file = str(tmp_path / "games.csv")
+    rows = synthetic_rows(120)
+    open(csv_file, "w").close()
+    assert ac.update_cube_file(csv_file, rows) == (120, 0, 0)
+    rows[0] = dict(rows[0], tags="Racing")
+    assert ac.update_cube_file(csv_file, rows[:100]) == (0, 1, 20)
+    cube = ac.load_cube_for_update(csv_file)
+    assert_same_cells(cube, ac.build_cube(rows[:100]))
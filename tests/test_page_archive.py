@@ -0,0 +1,62 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import page_archive  # noqa: E402
+from page_archive import PageArchive  # noqa: E402
+
+URL = "https://store.steampowered.com/app/10/"
+
+
+class FakeResponse:
+
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+        self.encoding = "utf-8"
+
+
+def build_archive(tmp_path, monkeypatch):
+    """两个分段：t=100 和 t=200 各抓一次完整页面，t=300 只读到前缀"""
+    archive = PageArchive(tmp_path)
+    now = [0.0]
+    monkeypatch.setattr(page_archive.time, "time", lambda: now[0])
+    for ts, segment, response, kwargs in [
+            (100.0, "pages-a.warc.gz", FakeResponse(b"v1"), {}),
+            (200.0, "pages-b.warc.gz", FakeResponse(b"v2"), {}),
+            (300.0, "pages-b.warc.gz", FakeResponse(b""), {"body": b"v3-prefix", "truncated": True}),
+            # 非 200 的响应不归档
+            (400.0, "pages-b.warc.gz", FakeResponse(b"", status_code=429), {})]:
+        now[0] = ts
+        archive.segment = segment
+        archive.record("app_page", URL, {"l": "english"}, response, **kwargs)
+    monkeypatch.undo()
+
+
+def replay(tmp_path, **kwargs):
+    return PageArchive(tmp_path, replay=True, **kwargs)
+
+
+def content(archive, prefix_ok=False):
+    return archive.lookup("app_page", URL, {"l": "english"}, prefix_ok=prefix_ok).content
+
+
+def test_latest_full_page_wins(tmp_path, monkeypatch):
+    build_archive(tmp_path, monkeypatch)
+    archive = replay(tmp_path)
+    assert content(archive) == b"v2"
+    assert content(archive, prefix_ok=True) == b"v3-prefix"
+    assert archive.lookup("app_page", URL, {"l": "schinese"}).status_code == 404
+
+
+def test_time_window_and_segments(tmp_path, monkeypatch):
+    build_archive(tmp_path, monkeypatch)
+    assert content(replay(tmp_path, until=200)) == b"v1"
+    assert content(replay(tmp_path, since=150)) == b"v2"
+    assert content(replay(tmp_path, segments=["pages-a.warc.gz"]), prefix_ok=True) == b"v1"
+    missing = replay(tmp_path, since=150, segments=["pages-a.warc.gz"])
+    assert missing.lookup("app_page", URL, {"l": "english"}).status_code == 404
+    assert [(seg, n) for seg, n, _, _ in replay(tmp_path).crawls()] == [("pages-a.warc.gz", 1),
+                                                                          ("pages-b.warc.gz", 2)]
+    assert replay(tmp_path).appids("app_page") == ["10"]
@@ -0,0 +1,53 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import price_history  # noqa: E402
+from price_history import PriceHistory  # noqa: E402
+
+
+def game(appid, current, original):
+    return {"appid": appid, "current_price": current, "original_price": original}
+
+
+def record_crawls(history):
+    # 1: 10.00 -> 5.00（折扣）-> 10.00；2: 价格一直不变
+    history.record([game("1", "10", "10"), game("2", "20", "20")], ts=1000)
+    history.record([game("1", "10", "10"), game("2", "20", "20")], ts=2000)
+    history.record([game("1", "5", "10"), game("2", "20", "20")], ts=3000)
+    history.record([game("1", "10", "10")], ts=4000)
+
+
+def test_only_changes_are_logged(tmp_path):
+    history = PriceHistory(tmp_path)
+    record_crawls(history)
+    with open(tmp_path / price_history.CHANGES_FILE, encoding="utf-8") as f:
+        assert len(f.readlines()) == 4
+    assert len(history.series[("1", "US")].starts) == 3
+
+
+def test_queries(tmp_path):
+    history = PriceHistory(tmp_path)
+    record_crawls(history)
+    assert history.price_at("1", 999) is None
+    assert history.price_at("1", 2500) == (10.0, 10.0)
+    assert history.price_at("1", 3500) == (5.0, 10.0)
+    assert history.price_at("2", 3000) == (20.0, 20.0)
+    # 2 最后一次被抓到是 3000
+    assert history.price_at("2", 3500) is None
+    assert history.discount_windows("1") == [(3000, 4000, 5.0, 10.0, 50.0)]
+    assert history.dropped_since(2500) == [("1", "US", 3000, 10.0, 5.0)]
+    assert history.dropped_since(3500) == []
+
+
+def test_reload_and_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(price_history, "COMPACT_LINES", 2)
+    history = PriceHistory(tmp_path)
+    record_crawls(history)
+    assert history.seen_lines == 1
+    reloaded = PriceHistory(tmp_path)
+    for key, series in history.series.items():
+        assert reloaded.series[key].last_seen == series.last_seen
+        assert list(reloaded.series[key].starts) == list(series.starts)
+    assert reloaded.price_at("1", 3500) == (5.0, 10.0)
@@ -0,0 +1,62 @@
+import os
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, os.path.join(SRC_DIR, "benchmarks"))
+
+import pytest  # noqa: E402
+
+import comments.simple_steam_crawler_easy as crawler  # noqa: E402
+import perf_metrics  # noqa: E402
+from comments.simple_steam_crawler_easy import AdaptiveSampling, wilson_interval  # noqa: E402
+from stub_steam_server import REVIEWS_PER_PAGE, StubSteamServer  # noqa: E402
+from threat_trends import ThreatTrends  # noqa: E402
+
+
+def test_wilson_interval():
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    low, high = wilson_interval(5, 10)
+    assert low == pytest.approx(0.2366, abs=1e-4)
+    assert high == pytest.approx(0.7634, abs=1e-4)
+    low, high = wilson_interval(0, 50)
+    assert low == 0.0 and 0 < high < 0.1
+    # 比例相同时样本越多区间越窄
+    widths = [high - low for low, high in (wilson_interval(3 * n, 10 * n) for n in (1, 10, 100))]
+    assert widths == sorted(widths, reverse=True)
+
+
+def test_adaptive_sampling_stops_early_only_for_clean_games():
+    sampling = AdaptiveSampling(min_reviews=20, max_reviews=200, target_width=0.1)
+    assert not sampling.should_stop(0, 10)
+    assert not sampling.should_stop(0, 30)
+    assert sampling.should_stop(0, 40)
+    # 威胁率接近一半时区间最宽，到上限也不满足
+    assert not sampling.should_stop(100, 200)
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.setattr(perf_metrics, "SLEEP_SCALE", 0.0)
+    monkeypatch.setattr(crawler, "REVIEWS_URL", crawler.REVIEWS_URL)
+    with StubSteamServer(5, error_rate=0.3, review_pages=4) as server:
+        server.point_modules_here()
+        yield server
+
+
+def test_fetch_reviews_retries_throttled_pages(stub):
+    reviews = crawler.fetch_reviews(stub.state.games[0]["appid"], max_reviews=35)
+    assert len(reviews) == 35
+    assert stub.state.injected_429 > 0
+
+
+def test_sampling_caps_reviews_and_trends_dedupe(stub, tmp_path):
+    appid = stub.state.games[0]["appid"]
+    sampling = AdaptiveSampling(min_reviews=10, max_reviews=2 * REVIEWS_PER_PAGE, target_width=0.01)
+    for _ in range(2):
+        trends = ThreatTrends(tmp_path / "threat_trends.json")
+        result = crawler.analyze_game_threats(appid, "Game", trends=trends, sampling=sampling)
+        assert result["total_reviews"] == 2 * REVIEWS_PER_PAGE
+        trends.save()
+    # 第二次抓到的是同一批评论，不再重复计入
+    assert ThreatTrends(tmp_path / "threat_trends.json").load()[appid].reviews == 2 * REVIEWS_PER_PAGE
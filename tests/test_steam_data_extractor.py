@@ -0,0 +1,54 @@
+import os
+import random
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, os.path.join(SRC_DIR, "benchmarks"))
+
+import perf_metrics  # noqa: E402
+import steam_data_extractor  # noqa: E402
+from steam_data_extractor import AppTagParser  # noqa: E402
+from stub_steam_server import StubSteamServer, render_app_page  # noqa: E402
+from synthetic import synthetic_game_row  # noqa: E402
+
+
+def feed_in_chunks(html, size):
+    parser = AppTagParser()
+    for start in range(0, len(html), size):
+        parser.feed(html[start:start + size])
+        if parser.done:
+            break
+    return parser
+
+
+def test_popular_tags_any_chunk_size():
+    game = synthetic_game_row(0, random.Random(1))
+    html = render_app_page(game)
+    for size in (7, 64, 4096, len(html)):
+        parser = feed_in_chunks(html, size)
+        assert parser.done
+        assert parser.tags() == game["tags"]
+
+
+def test_fallback_glance_tags():
+    html = ("<div class='glance_tags'><a href='#'>Indie</a><a href='#'> Puzzle </a><a href='#'>Indie</a>"
+            f"<a href='#'>{'x' * 50}</a></div><div class='glance_tags popular_tags'></div>")
+    parser = feed_in_chunks(html, 16)
+    assert not parser.done
+    assert parser.tags() == "Indie, Puzzle"
+
+
+def test_search_and_tags_from_stub(monkeypatch):
+    monkeypatch.setattr(perf_metrics, "SLEEP_SCALE", 0.0)
+    for name in ("BASE_SEARCH", "APP_URL", "APPDETAILS_API"):
+        monkeypatch.setattr(steam_data_extractor, name, getattr(steam_data_extractor, name))
+    with StubSteamServer(30, error_rate=0.5) as server:
+        server.point_modules_here()
+        # 搜索页被限流时重试（桩服务器的注入序列固定）
+        items = steam_data_extractor.parse_search_html(steam_data_extractor.fetch_search_page(page=1))
+        assert len(items) == 25
+        assert server.state.injected_429 > 0
+        server.state.error_rate = 0.0
+        for it in items[:5]:
+            assert steam_data_extractor.get_tags_from_app_page(it.appid) == server.state.by_appid[it.appid]["tags"]
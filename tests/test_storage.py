@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from storage import SqliteSink  # noqa: E402
+
+
+def suspicious_rows(appid, n):
+    return [{"appid": str(appid), "game_title": f"Game {appid}", "review_index": i,
+             "review_content": f"review {i}"} for i in range(n)]
+
+
+def test_replace_by_keeps_groups_larger_than_batch(tmp_path):
+    with SqliteSink(tmp_path / "steam.db", batch_size=500) as sink:
+        rows = [row for appid in (1, 2, 3) for row in suspicious_rows(appid, 300)]
+        sink.write("suspicious_reviews", rows)
+        assert sink.count("suspicious_reviews") == 900
+        assert len(sink.get("suspicious_reviews", 2)) == 300
+
+
+def test_replace_by_single_appid_over_batch_size(tmp_path):
+    with SqliteSink(tmp_path / "steam.db", batch_size=500) as sink:
+        sink.write("suspicious_reviews", suspicious_rows(7, 1200))
+        assert len(sink.get("suspicious_reviews", 7)) == 1200
+        # 再次写入较少的行时旧行被整体替换
+        sink.write("suspicious_reviews", suspicious_rows(7, 10))
+        assert len(sink.get("suspicious_reviews", 7)) == 10
+
+
+def test_replace_by_failure_keeps_old_rows(tmp_path):
+    with SqliteSink(tmp_path / "steam.db", batch_size=500) as sink:
+        sink.write("suspicious_reviews", suspicious_rows(7, 20))
+        rows = suspicious_rows(7, 1200)
+        # 第三批中的一行无法写入（整数超出 SQLite 范围）
+        rows[1100]["review_index"] = 2 ** 70
+        with pytest.raises(OverflowError):
+            sink.write("suspicious_reviews", rows)
+        assert len(sink.get("suspicious_reviews", 7)) == 20
@@ -0,0 +1,57 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from records import ThreatCounts  # noqa: E402
+from threat_trends import CountMinSketch, GameTrend, HyperLogLog, ThreatTrends, review_key  # noqa: E402
+
+CLEAN = ThreatCounts(0, 0, 0, (), ())
+
+
+def test_hll_merge_equals_union():
+    a, b, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    for i in range(3000):
+        a.add(f"user{i}")
+        union.add(f"user{i}")
+    for i in range(2000, 6000):
+        b.add(f"user{i}")
+        union.add(f"user{i}")
+    a.merge(b)
+    assert a.registers == union.registers
+    assert abs(a.count() - 6000) / 6000 < 0.1
+
+
+def test_cms_merge_adds_counts():
+    a, b = CountMinSketch(), CountMinSketch()
+    for _ in range(5):
+        a.add("代充")
+    b.add("代充", 3)
+    b.add("加群")
+    a.merge(b)
+    assert a.estimate("代充") >= 8
+    assert a.estimate("加群") >= 1
+    assert a.estimate("代充") - 8 <= 1
+
+
+def test_game_trend_skips_known_reviews():
+    trend = GameTrend(known=frozenset({review_key("alice", "")}))
+    assert not trend.add_review(review_key("alice", ""), "alice", CLEAN, ts=0)
+    assert trend.add_review(review_key("bob", ""), "bob", CLEAN, ts=0)
+    assert not trend.add_review(review_key("bob", ""), "bob", CLEAN, ts=0)
+    assert trend.reviews == 1
+
+
+def test_trends_survive_repeated_runs(tmp_path):
+    store = tmp_path / "threat_trends.json"
+    for _ in range(3):
+        trends = ThreatTrends(store)
+        trend = trends.new_trend("10")
+        for i in range(20):
+            author = f"user{i}"
+            trend.add_review(review_key(author, ""), author, CLEAN, ts=86400 * (i % 3))
+        trends.merge_game("10", trend)
+        trends.save()
+    games = ThreatTrends(store).load()
+    assert games["10"].reviews == 20
+    assert games["10"].buckets.window(86400 * 10, now=86400 * 3) == (20, 0)